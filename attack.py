@@ -3,9 +3,16 @@
 """
 
 from matrix_tools import get_minimum_of_matrix
-import scipy.optimize
 import heapq
-import multiprocessing
+import os
+import pickle
+import queue
+import random
+import threading
+import time
+import autotune
+import residuation
+import tropical_algebra
 
 
 def get_compressed_covers(F):
@@ -75,7 +82,21 @@ def compute_preweights(S, R):
     return lins, cols
 
 
-def get_weighted_sets(S, solve_linprog):
+def product_weight(lins, cols):
+    """The default weight of a base element by the numbers of other sets sharing its row and its column."""
+    return (lins + 1) * (cols + 1)
+
+
+def sum_weight(lins, cols):
+    """The weight of a base element, which prefers shared rows and columns less than product_weight."""
+    return lins + cols
+
+
+def get_weighted_sets(S, solve_linprog, weight=product_weight, rng=None):
+    """
+    Returns sets of the cover S as lists of base elements sorted by their weights.
+    If rng is given, base elements with the same weight are shuffled.
+    """
     W = []
     mandatory = [next(iter(T.ijs))
                  for T in filter(lambda T: len(T.ijs) == 1, S)]
@@ -86,7 +107,9 @@ def get_weighted_sets(S, solve_linprog):
             w = []
             for p in T.ijs:
                 if solve_linprog(mandatory + [p]):
-                    w.append([p, (lins[p[0]] + 1) * (cols[p[1]] + 1)])
+                    w.append([p, weight(lins[p[0]], cols[p[1]])])
+            if rng:
+                rng.shuffle(w)
             W.append([p[0]
                      for p in sorted(w, reverse=True, key=lambda x: x[1])])
         else:
@@ -122,18 +145,33 @@ def enumerate_with_queue(E, chunk_size=10):
         yield r[1]
 
 
-def enumerate_product_of_sets(W):
-    """Enumerates the Cartesian product of sets trying to yield heavier tuples sooner."""
+def enumerate_product_of_sets(W, potentials=None, M=None):
+    """
+    Enumerates the Cartesian product of sets trying to yield heavier tuples sooner.
+    If potentials of the grid of minima M are given, every prefix of a tuple of base elements is added to them
+    and rolled back after its tuples are enumerated, tuples with a prefix, equalities of which contradict
+    each other, are skipped.
+    """
+    def add(ij):
+        return potentials is None or potentials.add(ij[0], ij[1], M[ij])
+
     def enumerate_product_of_sets_(W, s, i):
         if i == len(W) - 1:
-            if s < len(W[i]):
-                yield [W[i][s]]
-            else:
+            if s >= len(W[i]):
                 return
+            mark = potentials.mark() if potentials else None
+            if add(W[i][s]):
+                yield [W[i][s]]
+            if potentials:
+                potentials.rollback(mark)
         else:
             for t in range(min(s + 1, len(W[i]))):
-                for q in enumerate_product_of_sets_(W, s - t, i + 1):
-                    yield [W[i][t]] + q
+                mark = potentials.mark() if potentials else None
+                if add(W[i][t]):
+                    for q in enumerate_product_of_sets_(W, s - t, i + 1):
+                        yield [W[i][t]] + q
+                if potentials:
+                    potentials.rollback(mark)
 
     l = sum(len(w) - 1 for w in W) + 1
     for s in range(l):
@@ -146,68 +184,643 @@ class Cover:
         self.ijs = ijs
 
 
-def apply_attack(d1, d2, compute_base_element, bounds=(None, None)):
-    """Applies our attack. Returns two polynomials p' and q'."""
+class Strategy:
+    """
+    A strategy to search a solution by covers: the weight of base elements in sets of a cover,
+    the chunk size of the queue sorting tuples, and, if seed is given, the random order of covers
+    of the same length and of base elements of the same weight.
+    """
+
+    def __init__(self, name="default", weight=product_weight, chunk_size=10, seed=None):
+        self.name = name
+        self.weight = weight
+        self.chunk_size = chunk_size
+        self.seed = seed
+
+    def __repr__(self):
+        return "Strategy({})".format(self.name)
+
+
+STRATEGIES = {
+    "default": Strategy(),
+    "sum": Strategy("sum", weight=sum_weight),
+    "greedy": Strategy("greedy", chunk_size=1),
+    "wide": Strategy("wide", chunk_size=100),
+}
+"""Strategies by names, the strategy random_<seed> is the default one with random restarts by the seed."""
+
+
+def get_strategies(names):
+    """Returns strategies by comma-separated names or None if names are not given."""
+    if not names:
+        return None
+    strategies = []
+    for name in names.split(","):
+        if name.startswith("random_"):
+            strategies.append(Strategy(name, seed=int(name[len("random_"):])))
+        else:
+            strategies.append(STRATEGIES[name])
+    return strategies
+
+
+def get_options(attack_params):
+    """Returns keyword arguments of apply_attack given by attack parameters."""
+    return {
+        "checkpoint": attack_params.get("checkpoint"),
+        "strategies": get_strategies(attack_params.get("portfolio")),
+        "feasibility": attack_params.get("feasibility"),
+        "tuner": attack_params["ring"].tuner,
+        "presolve": attack_params.get("presolve", True),
+        "search": attack_params.get("search"),
+    }
+
+
+SEARCHES = [None, "covers", "milp"]
+"""Methods to search a solution by the grid of minima, the search of covers is the default one."""
+
+
+class Solution(list):
+    """Polynomials p' and q' found by the strategy with the given name."""
+
+    def __init__(self, result, strategy):
+        super().__init__(result)
+        self.strategy = strategy
+
+
+class Deadline:
+    """A deadline in seconds from now (or None for no deadline) and a cancellation flag, which can be set from another thread."""
+
+    def __init__(self, seconds=None):
+        self.time = None if seconds is None else time.monotonic() + seconds
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def expired(self):
+        return self.cancelled.is_set() or (self.time is not None and time.monotonic() >= self.time)
+
+
+class TimedOut:
+    """The result of an attack stopped by a deadline. It is false, so that it is treated as no result."""
+
+    def __init__(self, base_elements, covers, linprogs):
+        self.base_elements = base_elements
+        self.covers = covers
+        self.linprogs = linprogs
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "TimedOut(base_elements={}, covers={}, linprogs={})".format(self.base_elements, self.covers, self.linprogs)
+
+
+class DeadlineExpired(Exception):
+    pass
+
+
+class AttackState:
+    """
+    The state of the attack: the grid of minima M, covers I of base elements, compressed covers G,
+    the index of the current cover in sorted G, and results of solved linear programs.
+    It can be saved to a checkpoint and resumed by the attack with the same key given by get_state_key.
+    """
+
+    def __init__(self, d1, d2, bounds, key=None):
+        self.key = key
+        self.d1 = d1
+        self.d2 = d2
+        self.bounds = tuple(bounds)
+        self.M = dict()
+        self.I = []
+        self.G = None
+        self.cover = 0
+        self.feasibility = dict()
+        self.stats = {"base_elements": 0, "covers": 0, "linprogs": 0}
+
+    def save(self, path):
+        """Saves the state to a file."""
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp, "wb") as f:
+            pickle.dump(self, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path, key):
+        """Returns the state saved to a file by the attack with the same key or None. A state of another attack is removed."""
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if getattr(state, "key", None) != key:
+            os.remove(path)
+            return None
+        return state
+
+
+def get_state_key(d1, d2, bounds, compute_base_element):
+    """
+    Returns the key of the state of an attack: a digest of the parameters and of the first base element,
+    which depends on the public matrices of the instance, so a checkpoint of another instance is not resumed.
+    """
+    import hashlib
+
+    A = compute_base_element(0, 0)
+    data = repr((d1, d2, tuple(bounds), [[str(a) for a in row] for row in A]))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def apply_attack(d1, d2, compute_base_element, bounds=(None, None), deadline=None, checkpoint=None, strategies=None,
+                 feasibility=None, tuner=None, verify=None, presolve=True, search=None):
+    """
+    Applies our attack. Returns two polynomials p' and q'.
+    If verify is given and presolve is true, principal solutions of the grid of minima are tried first,
+    the first one accepted by verify is returned.
+    The deadline is checked between computations of base elements, expansions of covers and linear programs.
+    If it expires, returns TimedOut with the numbers of computed base elements, expanded covers and solved linear programs.
+    If checkpoint is a path, then the state of the attack is saved there when the deadline expires,
+    and the next call with the same path resumes the attack from this state if it has the same key by get_state_key.
+    If several strategies are given, they race in separate processes on the same grid of minima,
+    the first found solution is returned as Solution with the name of the winner; only the grid is saved to the checkpoint then.
+    Linear programs are solved by the backend chosen by get_feasibility_backend.
+    If search is "milp", one mixed-integer program is solved by search_by_milp instead of the search of covers.
+    """
+    if search not in SEARCHES:
+        raise ValueError("Unknown search: {}".format(search))
+
+    key = get_state_key(d1, d2, bounds, compute_base_element) if checkpoint else None
+    state = AttackState.load(
+        checkpoint, key) or AttackState(d1, d2, bounds, key)
+
+    def check_deadline():
+        if deadline and deadline.expired():
+            raise DeadlineExpired()
+
+    try:
+        compute_minima(compute_base_element, state, check_deadline)
+        result = try_principal_solutions(state, verify, check_deadline) if verify and presolve else None
+        if not result and search == "milp":
+            result = search_by_milp(state, deadline)
+        elif not result:
+            feasibility = get_feasibility_backend(d1, d2, feasibility, tuner)
+            if strategies and len(strategies) > 1:
+                result = race(state, strategies, deadline, feasibility)
+            else:
+                result = search_solution(
+                    state, strategies[0] if strategies else Strategy(), check_deadline, feasibility)
+    except DeadlineExpired:
+        if checkpoint:
+            state.save(checkpoint)
+        return TimedOut(**state.stats)
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return result
+
+
+def get_principal_solutions(state):
+    """
+    Yields solutions [x, y] of x_i + y_j >= -M[(i, j)], which are closed under residuation, starting from every row
+    and every column of the grid. The sum of P(i, j) over all (i, j) with coefficients x_i and y_j is not less than
+    the public matrix then, so [x, y] is a solution of the attack iff every element of the public matrix is reached.
+    """
+    R = tropical_algebra.MatrixSemiring(tropical_algebra.R_min_plus(), max(state.d1, state.d2))
+    N = [[-state.M[(i, j)] for j in range(state.d2)] for i in range(state.d1)]
+    starts = [dict(q=[row]) for row in N] + [dict(p=[[row[j]] for row in N]) for j in range(state.d2)]
+    seen = set()
+    for start in starts:
+        x, y = residuation.solve_outer_product(R, N, **start)
+        result = [[row[0] for row in x], y[0]]
+        key = (tuple(result[0]), tuple(result[1]))
+        if key not in seen:
+            seen.add(key)
+            yield result
+
+
+def try_principal_solutions(state, verify, check_deadline):
+    """Returns the first principal solution, for which verify(result) is true, or None."""
+    for result in get_principal_solutions(state):
+        check_deadline()
+        if verify(result):
+            return result
+    return None
+
+
+def compute_minima(compute_base_element, state, check_deadline):
+    """Computes the grid of minima of base elements and compressed covers, which are not in the state yet."""
+    d1 = state.d1
+    d2 = state.d2
+    bounds = state.bounds
+    M = state.M
+    stats = state.stats
 
-    M = dict()
-    I = []
     for i in range(d1):
         for j in range(d2):
+            if (i, j) in M:
+                continue
+            check_deadline()
             m, inds = get_minimum_of_matrix(compute_base_element(i, j))
-            M[(i, j)] = m
+            stats["base_elements"] += 1
             if (not bounds[0] or m <= -2 * bounds[0]) and (not bounds[1] or m >= -2 * bounds[1]):
-                I.append(Cover(inds, {(i, j)}))
+                state.I.append(Cover(inds, {(i, j)}))
+            M[(i, j)] = m
+
+    if state.G is None:
+        check_deadline()
+        state.G = get_compressed_covers(state.I)
+
+
+def race(state, strategies, deadline=None, feasibility="linprog", poll=0.05):
+    """
+    Searches a solution with every strategy in a separate process on the same grid of minima.
+    The grid is published in shared memory, workers attach it instead of receiving a copy.
+    Returns the first found solution as Solution or None if no strategy finds a solution.
+    Raises DeadlineExpired if the deadline expires first.
+    """
+    import copy
+    import multiprocess
+    import shared_arrays
+
+    seconds = None
+    if deadline and deadline.time is not None:
+        seconds = max(0, deadline.time - time.monotonic())
+    q = multiprocess.Queue()
+
+    grid = [[state.M[(i, j)] for j in range(state.d2)]
+            for i in range(state.d1)]
+    shared_state = copy.copy(state)
+    shared_state.M = None
+
+    def run(strategy, ref):
+        local = Deadline(seconds)
+
+        def check_deadline():
+            if local.expired():
+                raise DeadlineExpired()
+
+        shared_state.M = shared_arrays.attach(ref)
+        try:
+            result = search_solution(
+                shared_state, strategy, check_deadline, feasibility)
+        except DeadlineExpired:
+            result = TimedOut(**shared_state.stats)
+        q.put((strategy.name, result))
+
+    with shared_arrays.SharedArrays() as arrays:
+        ref = arrays.publish(grid)
+        processes = [multiprocess.Process(target=run, args=(strategy, ref), daemon=True)
+                     for strategy in strategies]
+        for p in processes:
+            p.start()
+        try:
+            finished = 0
+            timed_out = False
+            while finished < len(processes):
+                try:
+                    name, result = q.get(timeout=poll)
+                except queue.Empty:
+                    if deadline and deadline.expired():
+                        raise DeadlineExpired()
+                    if not any(p.is_alive() for p in processes) and q.empty():
+                        break
+                    continue
+                finished += 1
+                if result:
+                    return Solution(result, name)
+                timed_out = timed_out or isinstance(result, TimedOut)
+            if timed_out:
+                raise DeadlineExpired()
+            return None
+        finally:
+            for p in processes:
+                p.terminate()
+                p.join()
+
+
+class Potentials:
+    """
+    A weighted union-find over the variables x_i and z_j = -y_j. An equality x_i + y_j = -M[(i, j)] fixes
+    the difference x_i - z_j, so all differences within a component are fixed by the potentials of its variables.
+    The offset of a variable is its value minus the value of its parent. Components are united by size
+    without path compression, so unions can be undone in the reverse order by rollback.
+    """
+
+    def __init__(self, d1, d2):
+        self.d1 = d1
+        self.parent = list(range(d1 + d2))
+        self.offset = [0] * (d1 + d2)
+        self.size = [1] * (d1 + d2)
+        self.unions = []
+
+    def find(self, v):
+        """Returns the root of the component of v and the value of v minus the value of the root."""
+        p = 0
+        while self.parent[v] != v:
+            p += self.offset[v]
+            v = self.parent[v]
+        return v, p
+
+    def add(self, i, j, m):
+        """Adds the equality x_i + y_j = -m. Returns False if it contradicts the equalities added before."""
+        ru, pu = self.find(i)
+        rv, pv = self.find(self.d1 + j)
+        if ru == rv:
+            return pu - pv == -m
+        # The value of rv minus the value of ru.
+        d = pu - pv + m
+        if self.size[ru] < self.size[rv]:
+            ru, rv, d = rv, ru, -d
+        self.parent[rv] = ru
+        self.offset[rv] = d
+        self.size[ru] += self.size[rv]
+        self.unions.append(rv)
+        return True
+
+    def mark(self):
+        """Returns the mark of the current equalities for rollback."""
+        return len(self.unions)
+
+    def rollback(self, mark):
+        """Undoes unions made after the mark."""
+        while len(self.unions) > mark:
+            v = self.unions.pop()
+            self.size[self.parent[v]] -= self.size[v]
+            self.parent[v] = v
+            self.offset[v] = 0
+
+
+def is_consistent(d1, d2, M, S, bounds):
+    """
+    Checks a necessary condition for the linear program of the tuple S to have a solution without solving it:
+    equalities of S have consistent potentials, the inequalities x_i + y_j >= -M[(i, j)] between variables
+    of the same component hold, and bounds leave a value for the root of every component.
+    """
+    P = Potentials(d1, d2)
+    for i, j in S:
+        if not P.add(i, j, M[(i, j)]):
+            return False
+
+    roots = [P.find(v) for v in range(d1 + d2)]
+    for i in range(d1):
+        ru, pu = roots[i]
+        for j in range(d2):
+            rv, pv = roots[d1 + j]
+            if ru == rv and pu - pv < -M[(i, j)]:
+                return False
+
+    lo, hi = bounds
+    intervals = dict()
+    for v, (r, p) in enumerate(roots):
+        # x_i = r + p and y_j = -(r + p) must be within bounds.
+        if v < d1:
+            a = None if lo is None else lo - p
+            b = None if hi is None else hi - p
+        else:
+            a = None if hi is None else -hi - p
+            b = None if lo is None else -lo - p
+        a0, b0 = intervals.get(r, (None, None))
+        a = a0 if a is None else a if a0 is None else max(a, a0)
+        b = b0 if b is None else b if b0 is None else min(b, b0)
+        if a is not None and b is not None and a > b:
+            return False
+        intervals[r] = (a, b)
+    return True
+
+
+def solve_by_linprog(d1, d2, M, S, bounds):
+    """
+    Solves the linear program for the grid of minima M and the tuple S of base elements:
+    x_i + y_j >= -M[(i, j)], the equality holds for (i, j) in S. Returns [x, y] or None if there is no solution.
+    """
+    import scipy.optimize
+
+    def make_matrices_for_linprog(S):
+        """Returns matrices for simplex method."""
+        c = [0 for _ in range(d1 + d2)]
+        Aub = []
+        bub = []
+        Aeq = []
+        beq = []
+
+        for i in range(d1):
+            for j in range(d2):
+                v = [-1 if k == i or k == d1 +
+                     j else 0 for k in range(d1 + d2)]
+                m = M[(i, j)]
+                if (i, j) in S:
+                    Aeq.append(v)
+                    beq.append(m)
+                else:
+                    Aub.append(v)
+                    bub.append(m)
+
+        if Aub == []:
+            Aub = None
+            bub = None
+        if Aeq == []:
+            Aeq = None
+            beq = None
+
+        return c, Aub, bub, Aeq, beq
+
+    c, Aub, bub, Aeq, beq = make_matrices_for_linprog(S)
+    T = scipy.optimize.linprog(
+        c, A_ub=Aub, b_ub=bub, A_eq=Aeq, b_eq=beq, bounds=bounds)
+    if not T.success:
+        return None
+    return [[T.x[i] for i in range(d1)], [T.x[d1 + i] for i in range(d2)]]
+
+
+def solve_by_graph(d1, d2, M, S, bounds):
+    """
+    Solves the same program as solve_by_linprog as a system of difference constraints by the Bellman-Ford algorithm.
+    Vertices are x_i, z_j = -y_j and s = 0: z_j - x_i <= M[(i, j)], x_i - z_j <= -M[(i, j)] for (i, j) in S,
+    and bounds give edges between s and other vertices. There is no solution iff there is a negative cycle.
+    """
+    S = set(S)
+    lo, hi = bounds
+    s = d1 + d2
+    edges = []
+    for i in range(d1):
+        for j in range(d2):
+            m = M[(i, j)]
+            edges.append((i, d1 + j, m))
+            if (i, j) in S:
+                edges.append((d1 + j, i, -m))
+    for i in range(d1):
+        if hi is not None:
+            edges.append((s, i, hi))
+        if lo is not None:
+            edges.append((i, s, -lo))
+    for j in range(d2):
+        if hi is not None:
+            edges.append((d1 + j, s, hi))
+        if lo is not None:
+            edges.append((s, d1 + j, -lo))
+
+    dist = [0] * (s + 1)
+    for k in range(s + 2):
+        changed = False
+        for u, v, w in edges:
+            if dist[u] + w < dist[v]:
+                dist[v] = dist[u] + w
+                changed = True
+        if not changed:
+            return [[dist[i] - dist[s] for i in range(d1)], [dist[s] - dist[d1 + j] for j in range(d2)]]
+    return None
 
-    G = get_compressed_covers(I)
+
+def search_by_milp(state, deadline=None):
+    """
+    Searches a solution by one mixed-integer program instead of linear programs of tuples of covers.
+    x_i + y_j >= -M[(i, j)] for all (i, j), the binary t_ij of a base element in covers forces the equality by big-M,
+    and every index of covers is covered by a base element with t_ij = 1. The program is solved by HiGHS,
+    then the exact solution for the tight base elements is found by solve_by_graph. Returns [x, y] or None.
+    Raises DeadlineExpired if the deadline expires first.
+    """
+    import numpy
+    import scipy.optimize
+    import scipy.sparse
+
+    d1 = state.d1
+    d2 = state.d2
+    M = state.M
+    # Covers with the same indices are merged by get_compressed_covers, so a cover can have several base elements.
+    inds = dict()
+    for T in state.I:
+        for ij in T.ijs:
+            inds[ij] = T.inds
+    pairs = sorted(inds)
+    covering = dict()
+    for k, ij in enumerate(pairs):
+        for ind in inds[ij]:
+            covering.setdefault(ind, []).append(k)
+
+    w = max(abs(m) for m in M.values()) + 1
+    lo, hi = state.bounds
+    W = (d1 + d2 + 1) * (w + abs(lo or 0) + abs(hi or 0))
+    lo = -W if lo is None else lo
+    hi = W if hi is None else hi
+    big = 2 * (abs(lo) + abs(hi)) + w
+
+    n = d1 + d2 + len(pairs)
+    rows = []
+    cols = []
+    vals = []
+    lb = []
+    ub = []
+
+    def add_row(coefs, l, u):
+        for c, v in coefs:
+            rows.append(len(lb))
+            cols.append(c)
+            vals.append(v)
+        lb.append(l)
+        ub.append(u)
+
+    for i in range(d1):
+        for j in range(d2):
+            add_row([(i, 1), (d1 + j, 1)], -M[(i, j)], numpy.inf)
+    for k, (i, j) in enumerate(pairs):
+        add_row([(i, 1), (d1 + j, 1), (d1 + d2 + k, big)], -numpy.inf, big - M[(i, j)])
+    for ks in covering.values():
+        add_row([(d1 + d2 + k, 1) for k in ks], 1, numpy.inf)
+
+    options = dict()
+    if deadline and deadline.time is not None:
+        options["time_limit"] = max(0, deadline.time - time.monotonic())
+    A = scipy.sparse.csr_array((vals, (rows, cols)), shape=(len(lb), n))
+    T = scipy.optimize.milp(
+        numpy.zeros(n), integrality=[0] * (d1 + d2) + [1] * len(pairs),
+        bounds=scipy.optimize.Bounds([lo] * (d1 + d2) + [0] * len(pairs), [hi] * (d1 + d2) + [1] * len(pairs)),
+        constraints=scipy.optimize.LinearConstraint(A, lb, ub), options=options)
+    state.stats["linprogs"] += 1
+    if T.status == 1 or (deadline and deadline.expired()):
+        raise DeadlineExpired()
+    if not T.success:
+        return None
+    tight = [pairs[k] for k in range(len(pairs)) if T.x[d1 + d2 + k] > 0.5]
+    return solve_by_graph(d1, d2, M, tight, state.bounds)
+
+
+FEASIBILITY_BACKENDS = {
+    "linprog": solve_by_linprog,
+    "graph": solve_by_graph,
+}
+"""Functions solving the linear program of a tuple by names of backends."""
+
+
+def get_feasibility_backend(d1, d2, feasibility=None, tuner=None):
+    """
+    Returns the name of the backend to solve linear programs: the given one, the one set by TROPICAL3_FEASIBILITY,
+    the fastest one for d1 + d2 variables by the tuner, or "linprog".
+    """
+    feasibility = feasibility or os.environ.get(autotune.FEASIBILITY_ENV)
+    if not feasibility and tuner:
+        feasibility = tuner.get(
+            "feasibility", "linprog/graph", d1 + d2, tune_feasibility)
+    feasibility = feasibility or "linprog"
+    if feasibility not in FEASIBILITY_BACKENDS:
+        raise ValueError("Unknown backend of feasibility: " + feasibility)
+    return feasibility
+
+
+def tune_feasibility(sizes):
+    """Times backends of feasibility for programs with given numbers of variables. Returns the fastest backend by every size."""
+    def make_args(n):
+        d1 = max(1, n // 2)
+        d2 = max(1, n - d1)
+        M = {(i, j): random.randint(-1000, 1000)
+             for i in range(d1) for j in range(d2)}
+        S = [(i, i % d2) for i in range(d1)]
+        return d1, d2, M, S, (-1000, 1000)
+
+    return autotune.fastest(FEASIBILITY_BACKENDS, make_args, sizes)
+
+
+def search_solution(state, strategy, check_deadline, feasibility="linprog"):
+    """
+    Searches two polynomials p' and q' by covers of the state in the order given by the strategy.
+    Linear programs are solved by the backend feasibility. Tuples are built with Potentials, so tuples with
+    contradicting equalities are not enumerated, and tuples rejected by is_consistent are not solved.
+    """
+    d1 = state.d1
+    d2 = state.d2
+    bounds = state.bounds
+    M = state.M
+    stats = state.stats
+    solve = FEASIBILITY_BACKENDS[feasibility]
 
     def solve_linprog(S):
         """Solves the linear program corresponding to cover S."""
-
-        def make_matrices_for_linprog(S):
-            """Returns matrices for simplex method."""
-            c = [0 for _ in range(d1 + d2)]
-            Aub = []
-            bub = []
-            Aeq = []
-            beq = []
-
-            for i in range(d1):
-                for j in range(d2):
-                    v = [-1 if k == i or k == d1 +
-                         j else 0 for k in range(d1 + d2)]
-                    m = M[(i, j)]
-                    if (i, j) in S:
-                        Aeq.append(v)
-                        beq.append(m)
-                    else:
-                        Aub.append(v)
-                        bub.append(m)
-
-            if Aub == []:
-                Aub = None
-                bub = None
-            if Aeq == []:
-                Aeq = None
-                beq = None
-
-            return c, Aub, bub, Aeq, beq
-
-        c, Aub, bub, Aeq, beq = make_matrices_for_linprog(S)
-        T = scipy.optimize.linprog(
-            c, A_ub=Aub, b_ub=bub, A_eq=Aeq, b_eq=beq, bounds=bounds)
-        if T.success:
-            return [[T.x[i] for i in range(d1)], [T.x[d1 + i] for i in range(d2)]]
-
-    def enumerate_covers(G):
-        """Enumerated covers generated from weighted sets."""
-
-        for S in sorted(G, key=len):
-            W = get_weighted_sets(S, solve_linprog)
-            yield from enumerate_with_queue(enumerate_product_of_sets(W))
-
-    for S in enumerate_covers(G):
-        result = solve_linprog(S)
-        if result:
-            return result
+        key = frozenset(S)
+        if key in state.feasibility:
+            return state.feasibility[key]
+
+        check_deadline()
+        if is_consistent(d1, d2, M, S, bounds):
+            result = solve(d1, d2, M, S, bounds)
+            stats["linprogs"] += 1
+        else:
+            result = None
+        state.feasibility[key] = result
+        return result
+    # Covers before state.cover are exhausted. Tuples of the current cover, which were tried before, are in state.feasibility.
+    rng = random.Random(strategy.seed) if strategy.seed is not None else None
+    covers = list(state.G)
+    if rng:
+        rng.shuffle(covers)
+    covers.sort(key=len)
+    while state.cover < len(covers):
+        check_deadline()
+        W = get_weighted_sets(
+            covers[state.cover], solve_linprog, strategy.weight, rng)
+        stats["covers"] += 1
+        for S in enumerate_with_queue(enumerate_product_of_sets(W, Potentials(d1, d2), M), strategy.chunk_size):
+            result = solve_linprog(S)
+            if result:
+                return result
+        state.cover += 1
 
     return None
@@ -4,21 +4,50 @@
 An attack on Protocol 2 from B. Amutha and R. Perumal, Public key exchange protocols based on tropical lower circulant and anti circulant matrices, AIMS Mathematics, 8(7): 17307–17334.
 """
 
-import tropical_algebra
-import matrix_tools
-from matrix_tools import generate_random_anti_t_p_circulant_matrix
-from matrix_tools import generate_random_matrix
-from matrix_tools import generate_basis_anti_t_p_circulant_matrix
+from key_exchange import AmuthaPerumal2
+from matrix_tools import generate_random_matrices
+from matrix_tools import generate_anti_t_p_circulant_matrices
+from matrix_tools import default_rng
+from matrix_tools import get_equal_matrices
 from matrix_tools import generate_anti_t_p_circulant_matrix
 from matrix_tools import subtract_matrix_from_matrix
+from matrix_tools import BasisProducts
 import attack
+import expressions
+import public_cache
 import test_tools
-from random import randint
-import argparse
+import tropical3
 
 
 def generate_instance(instance_params):
     R = instance_params["ring"]
+    rng = instance_params.get("rng")
+    protocol = AmuthaPerumal2.generate(R, instance_params, rng)
+    alice, bob = protocol.agree(rng)
+    KA = alice.get_key(bob.message)
+    KB = bob.get_key(alice.message)
+
+    if KA != KB:
+        return None
+
+    return {
+        "Y": protocol.public["Y"],
+        "s": protocol.public["s"],
+        "p": protocol.public["p"],
+        "t": protocol.public["t"],
+        "Ka": alice.message,
+        "Kb": bob.message
+    }, KA
+
+
+def generate_instances(instance_params, count):
+    """
+    Generates count instances of the protocol at once by batched products of matrices.
+    Returns the list of pairs (instance, key) for instances with KA = KB.
+    """
+    R = instance_params["ring"]
+    K = R.kernels()
+    rng = default_rng(instance_params.get("rng"))
     mm = instance_params["min_matrix_elem"]
     mM = instance_params["max_matrix_elem"]
     sm = instance_params["min_matrix_param"]
@@ -26,35 +55,30 @@ def generate_instance(instance_params):
     pm = instance_params["min_matrix_step"]
     pM = instance_params["max_matrix_step"]
 
-    s = randint(sm, sM)
-    t = randint(sm, sM)
-    p = randint(pm, pM)
-
-    Y = generate_random_matrix(R, mm, mM)
-    P1 = generate_random_anti_t_p_circulant_matrix(R, s, p, mm, mM)
-    Q1 = generate_random_anti_t_p_circulant_matrix(R, t, p, mm, mM)
-    P2 = generate_random_anti_t_p_circulant_matrix(R, s, p, mm, mM)
-    Q2 = generate_random_anti_t_p_circulant_matrix(R, t, p, mm, mM)
+    s = rng.integers(sm, sM, size=count, endpoint=True)
+    t = rng.integers(sm, sM, size=count, endpoint=True)
+    p = rng.integers(pm, pM, size=count, endpoint=True)
 
-    Ka = R.mul(P1, R.mul(Y, Q1))
-    Kb = R.mul(P2, R.mul(Y, Q2))
-    KA = R.mul(P1, R.mul(Kb, Q1))
-    KB = R.mul(P2, R.mul(Ka, Q2))
+    Y = generate_random_matrices(R, mm, mM, count, rng)
+    P1, Q1, P2, Q2 = [generate_anti_t_p_circulant_matrices(R, rng.integers(
+        mm, mM, size=count, endpoint=True), x, p) for x in (s, t, s, t)]
 
-    if KA != KB:
-        return None
+    Ka = K.mul_batch(P1, K.mul_batch(Y, Q1))
+    Kb = K.mul_batch(P2, K.mul_batch(Y, Q2))
+    KA = K.mul_batch(P1, K.mul_batch(Kb, Q1))
+    KB = K.mul_batch(P2, K.mul_batch(Ka, Q2))
 
-    return {
-        "Y": Y,
-        "s": s,
-        "p": p,
-        "t": t,
-        "Ka": Ka,
-        "Kb": Kb
-    }, KA
+    return [({
+        "Y": K.tolist(Y[b]),
+        "s": int(s[b]),
+        "p": int(p[b]),
+        "t": int(t[b]),
+        "Ka": K.tolist(Ka[b]),
+        "Kb": K.tolist(Kb[b])
+    }, R.freeze(K.tolist(KA[b]))) for b in get_equal_matrices(KA, KB)]
 
 
-def run_attack(attack_params, instance):
+def run_attack(attack_params, instance, deadline=None):
     R = attack_params["ring"]
     mm = attack_params["min_matrix_elem"]
     mM = attack_params["max_matrix_elem"]
@@ -65,13 +89,21 @@ def run_attack(attack_params, instance):
     Y = instance["Y"]
     Ka = instance["Ka"]
 
+    products = public_cache.get_derived("BasisProducts", R, ("anti", s, t, p, R.freeze(Y)),
+                                        lambda: BasisProducts(R, "anti", s, t, Y, p, keep=True), 2)
+
     def compute_base_element(i, j):
-        B1 = generate_basis_anti_t_p_circulant_matrix(R, s, p)
-        B2 = generate_basis_anti_t_p_circulant_matrix(R, t, p)
+        return subtract_matrix_from_matrix(products(i, j), Ka)
+
+    E = expressions.Expressions(R)
 
-        return subtract_matrix_from_matrix(R.mul(R.mul(B1, Y), B2), Ka)
+    def verify(result):
+        P = generate_anti_t_p_circulant_matrix(R, result[0][0], s, p)
+        Q = generate_anti_t_p_circulant_matrix(R, result[1][0], t, p)
+        return E.equals(E.mul(E.matrix(P), E.matrix(Y), E.matrix(Q)), Ka)
 
-    return attack.apply_attack(1, 1, compute_base_element, bounds=(mm, mM))
+    return attack.apply_attack(1, 1, compute_base_element, bounds=(mm, mM), deadline=deadline, verify=verify,
+                               **attack.get_options(attack_params))
 
 
 def check_key(attack_params, instance, key, result):
@@ -84,95 +116,18 @@ def check_key(attack_params, instance, key, result):
 
     P = generate_anti_t_p_circulant_matrix(R, result[0][0], s, p)
     Q = generate_anti_t_p_circulant_matrix(R, result[1][0], t, p)
-    KC = R.mul(R.mul(P, Kb), Q)
+    E = expressions.Expressions(R)
 
-    return key == KC
+    return E.equals(E.mul(E.matrix(P), E.matrix(Kb), E.matrix(Q)), key)
 
 
-def perform_one_experiment(instance_params, attack_params):
-    return test_tools.perform_one_experiment(instance_params, attack_params, generate_instance, run_attack, check_key)
+def perform_one_experiment(instance_params, attack_params, deadline=None):
+    return test_tools.perform_one_experiment(instance_params, attack_params, generate_instance, run_attack, check_key, deadline)
 
 
 def get_arguments_parser():
-    parser = argparse.ArgumentParser(
-        description="The script to check the attack.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-
-    parser.add_argument(
-        "--count",
-        help="Number of tests",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--size",
-        help="Size of matrices",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--timeout",
-        help="Timeout for each experiment",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--min_matrix_elem",
-        help="Lower bound to generate elements of matrices",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--max_matrix_elem",
-        help="Lower bound to generate elements of matrices",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--min_matrix_param",
-        help="Lower bound to generate s and t",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--max_matrix_param",
-        help="Lower bound to generate s and t",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--min_matrix_step",
-        help="Lower bound to generate p",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--max_matrix_step",
-        help="Lower bound to generate p",
-        required=True,
-        type=int
-    )
-
-    return parser
+    return tropical3.get_arguments_parser("ap_2")
 
 
 if __name__ == "__main__":
-    args = get_arguments_parser().parse_args()
-    R = tropical_algebra.MatrixSemiring(
-        tropical_algebra.R_min_plus(), args.size)
-
-    test_tools.test_suite(perform_one_experiment,
-                          {
-                              "ring": R,
-                              "min_matrix_elem": args.min_matrix_elem,
-                              "max_matrix_elem": args.max_matrix_elem,
-                              "min_matrix_param": args.min_matrix_param,
-                              "max_matrix_param": args.max_matrix_param,
-                              "min_matrix_step": args.min_matrix_step,
-                              "max_matrix_step": args.max_matrix_step,
-                          },
-                          {
-                              "ring": R,
-                              "min_matrix_elem": args.min_matrix_elem,
-                              "max_matrix_elem": args.max_matrix_elem,
-                          },
-                          args.count, args.timeout)
+    tropical3.run("ap_2", get_arguments_parser().parse_args())
@@ -4,77 +4,101 @@
 An attack on the protocol from D. Grigoriev, V. Shpilrain, "Tropical cryptography", Comm. Algebra 43 (2014), 2624–2632, Section 2.
 """
 
-import tropical_algebra
-from matrix_tools import generate_random_matrix
-from matrix_tools import generate_random_polynomial
+from key_exchange import GrigorievShpilrain
+from matrix_tools import generate_random_matrices
+from matrix_tools import generate_random_polynomials
+from matrix_tools import default_rng
+from matrix_tools import get_equal_matrices
 from matrix_tools import subtract_matrix_from_matrix
+from power_cache import PowerCache
 import attack
+import expressions
+import public_cache
 import test_tools
-import argparse
-from random import randint
+import tropical3
 
 
 def generate_instance(instance_params):
     """Generates an instance of the protocol."""
     R = instance_params["ring"]
-    dm = instance_params["min_poly_deg"]
-    dM = instance_params["max_poly_deg"]
-    mm = instance_params["min_matrix_elem"]
-    mM = instance_params["max_matrix_elem"]
-    cm = instance_params["min_poly_coef"]
-    cM = instance_params["max_poly_coef"]
-
-    D1 = randint(dm, dM)
-    D2 = randint(dm, dM)
-    D3 = randint(dm, dM)
-    D4 = randint(dm, dM)
-    A = generate_random_matrix(R, mm, mM)
-    B = generate_random_matrix(R, mm, mM)
-    p1 = generate_random_polynomial(D1, cm, cM)
-    p2 = generate_random_polynomial(D2, cm, cM)
-    q1 = generate_random_polynomial(D3, cm, cM)
-    q2 = generate_random_polynomial(D4, cm, cM)
-    u = R.mul(R.calc_poly(p1, A), R.calc_poly(p2, B))
-    v = R.mul(R.calc_poly(q1, A), R.calc_poly(q2, B))
-    KA = R.mul(R.calc_poly(p1, A), R.mul(v, R.calc_poly(p2, B)))
-    KB = R.mul(R.calc_poly(q1, A), R.mul(u, R.calc_poly(q2, B)))
+    rng = instance_params.get("rng")
+    protocol = GrigorievShpilrain.generate(R, instance_params, rng)
+    alice, bob = protocol.agree(rng)
+    KA = alice.get_key(bob.message)
+    KB = bob.get_key(alice.message)
 
     if KA != KB:
         return None
 
     return {
-        "A": A,
-        "B": B,
-        "u": u,
-        "v": v,
+        "A": protocol.public["A"],
+        "B": protocol.public["B"],
+        "u": alice.message,
+        "v": bob.message,
     }, KA
 
 
-def run_attack(attack_params, instance):
+def generate_instances(instance_params, count):
+    """
+    Generates count instances of the protocol at once by batched products of matrices.
+    Returns the list of pairs (instance, key) for instances with KA = KB.
+    """
+    R = instance_params["ring"]
+    K = R.kernels()
+    rng = default_rng(instance_params.get("rng"))
+    dm = instance_params["min_poly_deg"]
+    dM = instance_params["max_poly_deg"]
+    mm = instance_params["min_matrix_elem"]
+    mM = instance_params["max_matrix_elem"]
+    cm = instance_params["min_poly_coef"]
+    cM = instance_params["max_poly_coef"]
+
+    A = generate_random_matrices(R, mm, mM, count, rng)
+    B = generate_random_matrices(R, mm, mM, count, rng)
+    p1, p2, q1, q2 = [generate_random_polynomials(
+        R, dm, dM, cm, cM, count, rng) for i in range(4)]
+    p1A, q1A = K.calc_polys_batch(A, p1, q1)
+    p2B, q2B = K.calc_polys_batch(B, p2, q2)
+    u = K.mul_batch(p1A, p2B)
+    v = K.mul_batch(q1A, q2B)
+    KA = K.mul_batch(p1A, K.mul_batch(v, p2B))
+    KB = K.mul_batch(q1A, K.mul_batch(u, q2B))
+
+    return [({
+        "A": K.tolist(A[b]),
+        "B": K.tolist(B[b]),
+        "u": K.tolist(u[b]),
+        "v": K.tolist(v[b]),
+    }, R.freeze(K.tolist(KA[b]))) for b in get_equal_matrices(KA, KB)]
+
+
+def run_attack(attack_params, instance, deadline=None):
     dM = attack_params["max_poly_deg"]
     cm = attack_params["min_poly_coef"]
     R = attack_params["ring"]
     A = instance["A"]
     B = instance["B"]
 
-    cache_Ai = dict()
-    cache_Bj = dict()
+    directory = attack_params.get("power_cache_dir")
 
-    cache_Ai[0] = R.one()
-    cache_Ai[1] = A
-    for i in range(2, dM + 1):
-        cache_Ai[i] = R.mul(cache_Ai[i - 1], A)
+    def get_powers(X):
+        return public_cache.get_derived("PowerCache", R, (R.freeze(X), directory), lambda: PowerCache(R, X, directory), dM + 1)
 
-    cache_Bj[0] = R.one()
-    cache_Bj[1] = B
-    for j in range(2, dM + 1):
-        cache_Bj[j] = R.mul(cache_Bj[j - 1], B)
+    cache_Ai = get_powers(A)
+    cache_Bj = get_powers(B)
 
     def compute_base_element(i, j):
         u = instance["u"]
         return subtract_matrix_from_matrix(R.mul(cache_Ai[i], cache_Bj[j]), u)
 
-    return attack.apply_attack(dM + 1, dM + 1, compute_base_element, bounds=(cm, None))
+    E = expressions.Expressions(R)
+
+    def verify(result):
+        u = instance["u"]
+        return E.equals(E.mul(E.poly(result[0], E.matrix(A)), E.poly(result[1], E.matrix(B))), u)
+
+    return attack.apply_attack(dM + 1, dM + 1, compute_base_element, bounds=(cm, None), deadline=deadline, verify=verify,
+                               **attack.get_options(attack_params))
 
 
 def check_key(attack_params, instance, key, result):
@@ -83,94 +107,19 @@ def check_key(attack_params, instance, key, result):
     B = instance["B"]
     v = instance["v"]
 
-    KC = R.mul(R.calc_poly(result[0], A),
-               R.mul(v, R.calc_poly(result[1], B)))
+    E = expressions.Expressions(R)
+    KC = E.mul(E.poly(result[0], E.matrix(A)), E.matrix(v), E.poly(result[1], E.matrix(B)))
 
-    return key == KC
+    return E.equals(KC, key)
 
 
-def perform_one_experiment(instance_params, attack_params):
-    return test_tools.perform_one_experiment(instance_params, attack_params, generate_instance, run_attack, check_key)
+def perform_one_experiment(instance_params, attack_params, deadline=None):
+    return test_tools.perform_one_experiment(instance_params, attack_params, generate_instance, run_attack, check_key, deadline)
 
 
 def get_arguments_parser():
-    parser = argparse.ArgumentParser(
-        description="The script to check the attack.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-
-    parser.add_argument(
-        "--count",
-        help="Number of tests",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--size",
-        help="Size of matrices",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--timeout",
-        help="Timeout for each experiment",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--min_matrix_elem",
-        help="Lower bound to generate elements of matrices",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--max_matrix_elem",
-        help="Upper bound to generate elements of matrices",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--min_poly_deg",
-        help="Lower bound to generate polynomial degrees",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--max_poly_deg",
-        help="Upper bound to generate polynomial degrees",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--min_poly_coef",
-        help="Lower bound to generate polynomial coefficients",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--max_poly_coef",
-        help="Upper bound to generate polynomial coefficients",
-        required=True,
-        type=int
-    )
-    return parser
+    return tropical3.get_arguments_parser("gs")
 
 
 if __name__ == "__main__":
-    args = get_arguments_parser().parse_args()
-    R = tropical_algebra.MatrixSemiring(
-        tropical_algebra.R_min_plus(), args.size)
-    test_tools.test_suite(perform_one_experiment,
-                          {
-                              "ring": R,
-                              "min_matrix_elem": args.min_matrix_elem,
-                              "max_matrix_elem": args.max_matrix_elem,
-                              "min_poly_deg": args.min_poly_deg,
-                              "max_poly_deg": args.max_poly_deg,
-                              "min_poly_coef": args.min_poly_coef,
-                              "max_poly_coef": args.max_poly_coef},
-                          {
-                              "ring": R,
-                              "max_poly_deg": args.max_poly_deg,
-                              "min_poly_coef": args.min_poly_coef,
-                              "max_poly_coef": args.max_poly_coef
-                          },
-                          args.count, args.timeout)
+    tropical3.run("gs", get_arguments_parser().parse_args())
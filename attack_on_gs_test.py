@@ -2,10 +2,16 @@
 (c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
 """
 
+import contextlib
+import io
+import os
+import tempfile
 import unittest
 import attack_on_gs
 import tropical_algebra
 import matrix_tools
+import attack
+import test_tools
 
 
 class TestTropicalAlgebra(unittest.TestCase):
@@ -61,6 +67,59 @@ class TestTropicalAlgebra(unittest.TestCase):
         self.assertEqual(K, R.mul(R.calc_poly(
             result[0], A), R.mul(v, R.calc_poly(result[1], B))))
 
+        deadline = attack.Deadline(60)
+        result = attack_on_gs.run_attack(attack_params, instance, deadline)
+        self.assertEqual(K, R.mul(R.calc_poly(
+            result[0], A), R.mul(v, R.calc_poly(result[1], B))))
+
+        deadline.cancel()
+        result = attack_on_gs.run_attack(attack_params, instance, deadline)
+        self.assertIsInstance(result, attack.TimedOut)
+        self.assertFalse(result)
+        self.assertEqual(0, result.base_elements)
+
+        result = attack_on_gs.run_attack(
+            attack_params, instance, attack.Deadline(0))
+        self.assertIsInstance(result, attack.TimedOut)
+
+        portfolio_params = dict(attack_params)
+        portfolio_params["portfolio"] = "default,greedy,sum,random_1"
+        portfolio_params["presolve"] = False
+        result = attack_on_gs.run_attack(
+            portfolio_params, instance, attack.Deadline(60))
+        self.assertIsInstance(result, attack.Solution)
+        self.assertIn(result.strategy, ["default", "greedy", "sum", "random_1"])
+        self.assertEqual(K, R.mul(R.calc_poly(
+            result[0], A), R.mul(v, R.calc_poly(result[1], B))))
+
+        # The winner is reported by the summary, not printed by the experiment.
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = test_tools.perform_one_experiment(None, portfolio_params, lambda params: (instance, K),
+                                                       attack_on_gs.run_attack, attack_on_gs.check_key, attack.Deadline(60))
+        self.assertEqual("", output.getvalue())
+        self.assertEqual("OK", test_tools.get_test_result(result))
+        self.assertTrue(result)
+        self.assertIn(result.strategy, ["default", "greedy", "sum", "random_1"])
+        with contextlib.redirect_stdout(output):
+            test_tools.print_summary([result, "FAIL"], 1.0)
+        self.assertIn("OK (BY THE STRATEGY {}):  1".format(result.strategy), output.getvalue())
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_params = dict(attack_params)
+            checkpoint_params["checkpoint"] = os.path.join(
+                directory, "state.pkl")
+            result = attack_on_gs.run_attack(
+                checkpoint_params, instance, attack.Deadline(0))
+            self.assertIsInstance(result, attack.TimedOut)
+            self.assertTrue(os.path.exists(checkpoint_params["checkpoint"]))
+
+            result = attack_on_gs.run_attack(
+                checkpoint_params, instance, attack.Deadline(60))
+            self.assertEqual(K, R.mul(R.calc_poly(
+                result[0], A), R.mul(v, R.calc_poly(result[1], B))))
+            self.assertFalse(os.path.exists(checkpoint_params["checkpoint"]))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -4,50 +4,77 @@
 An attack on Protocol 1 from Huang, Li, and Deng, "Public-Key Cryptography Based on Tropical Circular Matrices", Applied Sciences, 12.15 (2022): 7401.
 """
 
-import tropical_algebra
-from matrix_tools import generate_random_matrix
-from matrix_tools import generate_random_upper_t_circulant_matrix
+from key_exchange import HuangLiDeng
+from matrix_tools import generate_random_matrices
+from matrix_tools import generate_t_circulant_matrices
+from matrix_tools import default_rng
+from matrix_tools import get_equal_matrices
 from matrix_tools import generate_upper_t_circulant_matrix
-from matrix_tools import mul_basis_upper_t_circulant_matrix_and_matrix
-from matrix_tools import mul_matrix_and_basis_upper_t_circulant_matrix
 from matrix_tools import subtract_matrix_from_matrix
+from matrix_tools import BasisProducts
 import attack
+import expressions
+import public_cache
 import test_tools
-from random import randint
-import argparse
+import tropical3
 
 
 def generate_instance(instance_params):
     R = instance_params["ring"]
-    mm = instance_params["min_matrix_elem"]
-    mM = instance_params["max_matrix_elem"]
-    sm = instance_params["min_matrix_param"]
-    sM = instance_params["max_matrix_param"]
+    rng = instance_params.get("rng")
+    protocol = HuangLiDeng.generate(R, instance_params, rng)
+    alice, bob = protocol.agree(rng)
+    KA = alice.get_key(bob.message)
+    KB = bob.get_key(alice.message)
 
-    s = randint(sm, sM)
-    t = randint(sm, sM)
-    Y = generate_random_matrix(R, mm, mM)
-    P1 = generate_random_upper_t_circulant_matrix(R, s, mm, mM)
-    Q1 = generate_random_upper_t_circulant_matrix(R, t, mm, mM)
-    P2 = generate_random_upper_t_circulant_matrix(R, s, mm, mM)
-    Q2 = generate_random_upper_t_circulant_matrix(R, t, mm, mM)
-    Ka = R.mul(P1, R.mul(Y, Q1))
-    Kb = R.mul(P2, R.mul(Y, Q2))
-    KA = R.mul(P1, R.mul(Kb, Q1))
-    KB = R.mul(P2, R.mul(Ka, Q2))
     if KA != KB:
         return None
 
     return {
-        "Y": Y,
-        "s": s,
-        "t": t,
-        "Ka": Ka,
-        "Kb": Kb,
+        "Y": protocol.public["Y"],
+        "s": protocol.public["s"],
+        "t": protocol.public["t"],
+        "Ka": alice.message,
+        "Kb": bob.message,
     }, KA
 
 
-def run_attack(attack_params, instance):
+def generate_instances(instance_params, count):
+    """
+    Generates count instances of the protocol at once by batched products of matrices.
+    Returns the list of pairs (instance, key) for instances with KA = KB.
+    """
+    R = instance_params["ring"]
+    K = R.kernels()
+    rng = default_rng(instance_params.get("rng"))
+    mm = instance_params["min_matrix_elem"]
+    mM = instance_params["max_matrix_elem"]
+    sm = instance_params["min_matrix_param"]
+    sM = instance_params["max_matrix_param"]
+    n = R.size()
+
+    s = rng.integers(sm, sM, size=count, endpoint=True)
+    t = rng.integers(sm, sM, size=count, endpoint=True)
+
+    Y = generate_random_matrices(R, mm, mM, count, rng)
+    P1, Q1, P2, Q2 = [generate_t_circulant_matrices(R, rng.integers(
+        mm, mM, size=(count, n), endpoint=True), x, True) for x in (s, t, s, t)]
+
+    Ka = K.mul_batch(P1, K.mul_batch(Y, Q1))
+    Kb = K.mul_batch(P2, K.mul_batch(Y, Q2))
+    KA = K.mul_batch(P1, K.mul_batch(Kb, Q1))
+    KB = K.mul_batch(P2, K.mul_batch(Ka, Q2))
+
+    return [({
+        "Y": K.tolist(Y[b]),
+        "s": int(s[b]),
+        "t": int(t[b]),
+        "Ka": K.tolist(Ka[b]),
+        "Kb": K.tolist(Kb[b]),
+    }, R.freeze(K.tolist(KA[b]))) for b in get_equal_matrices(KA, KB)]
+
+
+def run_attack(attack_params, instance, deadline=None):
     R = attack_params["ring"]
     mm = attack_params["min_matrix_elem"]
     mM = attack_params["max_matrix_elem"]
@@ -58,15 +85,24 @@ def run_attack(attack_params, instance):
     Y = instance["Y"]
     Ka = instance["Ka"]
 
-    cache_Bi_mul_Y = dict()
+    # All products are kept for the next attacks on the same public parameters if they fit into the cache.
+    keep = public_cache.fits(R, n + n * n)
+    products = public_cache.get_derived("BasisProducts", R, ("upper", s, t, R.freeze(Y)),
+                                        lambda: BasisProducts(R, "upper", s, t, Y, keep=keep),
+                                        n + n * n if keep else n)
 
     def compute_base_element(i, j):
-        if i not in cache_Bi_mul_Y:
-            cache_Bi_mul_Y[i] = mul_basis_upper_t_circulant_matrix_and_matrix(
-                R, s, i, Y)
-        return subtract_matrix_from_matrix(mul_matrix_and_basis_upper_t_circulant_matrix(R, t, j, cache_Bi_mul_Y[i]), Ka)
+        return subtract_matrix_from_matrix(products(i, j), Ka)
+
+    E = expressions.Expressions(R)
+
+    def verify(result):
+        P = generate_upper_t_circulant_matrix(R, result[0], s)
+        Q = generate_upper_t_circulant_matrix(R, result[1], t)
+        return E.equals(E.mul(E.matrix(P), E.matrix(Y), E.matrix(Q)), Ka)
 
-    return attack.apply_attack(n, n, compute_base_element, bounds=(mm, mM))
+    return attack.apply_attack(n, n, compute_base_element, bounds=(mm, mM), deadline=deadline, verify=verify,
+                               **attack.get_options(attack_params))
 
 
 def check_key(attack_params, instance, key, result):
@@ -78,81 +114,18 @@ def check_key(attack_params, instance, key, result):
     P = generate_upper_t_circulant_matrix(R, result[0], s)
     Q = generate_upper_t_circulant_matrix(R, result[1], t)
 
-    KC = R.mul(R.mul(P, Kb), Q)
+    E = expressions.Expressions(R)
 
-    return key == KC
+    return E.equals(E.mul(E.matrix(P), E.matrix(Kb), E.matrix(Q)), key)
 
 
-def perform_one_experiment(instance_params, attack_params):
-    return test_tools.perform_one_experiment(instance_params, attack_params, generate_instance, run_attack, check_key)
+def perform_one_experiment(instance_params, attack_params, deadline=None):
+    return test_tools.perform_one_experiment(instance_params, attack_params, generate_instance, run_attack, check_key, deadline)
 
 
 def get_arguments_parser():
-    parser = argparse.ArgumentParser(
-        description="The script to check the attack.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-
-    parser.add_argument(
-        "--count",
-        help="Number of tests",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--size",
-        help="Size of matrices",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--timeout",
-        help="Timeout for each experiment",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--min_matrix_elem",
-        help="Lower bound to generate elements of matrices",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--max_matrix_elem",
-        help="Upper bound to generate elements of matrices",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--min_matrix_param",
-        help="Lower bound to generate s and t",
-        required=True,
-        type=int
-    )
-    parser.add_argument(
-        "--max_matrix_param",
-        help="Lower bound to generate s and t",
-        required=True,
-        type=int
-    )
-
-    return parser
+    return tropical3.get_arguments_parser("hld")
 
 
 if __name__ == "__main__":
-    args = get_arguments_parser().parse_args()
-    R = tropical_algebra.MatrixSemiring(
-        tropical_algebra.R_min_plus(), args.size)
-
-    test_tools.test_suite(perform_one_experiment,
-                          {
-                              "ring": R,
-                              "min_matrix_elem": args.min_matrix_elem,
-                              "max_matrix_elem": args.max_matrix_elem,
-                              "min_matrix_param": args.min_matrix_param,
-                              "max_matrix_param": args.max_matrix_param,
-                          },
-                          {
-                              "ring": R,
-                              "min_matrix_elem": args.min_matrix_elem,
-                              "max_matrix_elem": args.max_matrix_elem,
-                          },
-                          args.count, args.timeout)
+    tropical3.run("hld", get_arguments_parser().parse_args())
@@ -2,7 +2,12 @@
 (c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
 """
 
+import os
+import pickle
+import tempfile
 import unittest
+import numpy
+import attack
 import attack_on_hld
 import tropical_algebra
 import matrix_tools
@@ -67,6 +72,77 @@ class TestTropicalAlgebra(unittest.TestCase):
         self.assertEqual(Ka, R.mul(R.mul(P, Y), Q))
         self.assertEqual(K, R.mul(R.mul(P, Kb), Q))
 
+        milp_params = dict(attack_params, presolve=False, search="milp")
+        result = attack_on_hld.run_attack(milp_params, instance)
+        P = matrix_tools.generate_upper_t_circulant_matrix(R, result[0], s)
+        Q = matrix_tools.generate_upper_t_circulant_matrix(R, result[1], t)
+
+        self.assertEqual(Ka, R.mul(R.mul(P, Y), Q))
+        self.assertEqual(K, R.mul(R.mul(P, Kb), Q))
+
+        with self.assertRaises(ValueError):
+            attack_on_hld.run_attack(dict(attack_params, search="unknown"), instance)
+
+    def test_checkpoint(self):
+        R = tropical_algebra.MatrixSemiring(
+            tropical_algebra.R_min_plus(), 5)
+        instance_params = {
+            "ring": R,
+            "min_matrix_elem": 0,
+            "max_matrix_elem": 2**10,
+            "min_matrix_param": 0,
+            "max_matrix_param": 2**10,
+        }
+        instances = []
+        seed = 0
+        while len(instances) < 2:
+            seed += 1
+            generated = attack_on_hld.generate_instance(
+                dict(instance_params, rng=numpy.random.default_rng(seed)))
+            if generated:
+                instances.append(generated)
+
+        class CountingDeadline(attack.Deadline):
+            """Counts checks of the deadline, it expires after limit checks, e.g., when the grid of minima is computed."""
+
+            def __init__(self, limit=None):
+                super().__init__()
+                self.limit = limit
+                self.calls = 0
+
+            def expired(self):
+                self.calls += 1
+                return self.limit is not None and self.calls > self.limit
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "state.pkl")
+            attack_params = dict(instance_params, checkpoint=path, presolve=False)
+            (instance1, key1), (instance2, key2) = instances
+
+            # The grid is computed after 5 * 5 base elements and the compression of covers.
+            result = attack_on_hld.run_attack(attack_params, instance1, CountingDeadline(5 * 5 + 1))
+            self.assertIsInstance(result, attack.TimedOut)
+            self.assertEqual(25, result.base_elements)
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            self.assertEqual(25, len(state.M))
+            self.assertIsNotNone(state.G)
+
+            result = attack_on_hld.run_attack(attack_params, instance2, attack.Deadline(60))
+            self.assertTrue(attack_on_hld.check_key(attack_params, instance2, key2, result))
+            self.assertFalse(os.path.exists(path))
+
+            fresh = CountingDeadline()
+            result = attack_on_hld.run_attack(attack_params, instance1, fresh)
+            self.assertTrue(attack_on_hld.check_key(attack_params, instance1, key1, result))
+
+            attack_on_hld.run_attack(attack_params, instance1, CountingDeadline(5 * 5 + 1))
+            resumed = CountingDeadline()
+            result = attack_on_hld.run_attack(attack_params, instance1, resumed)
+            self.assertTrue(attack_on_hld.check_key(attack_params, instance1, key1, result))
+            self.assertEqual(fresh.calls - (5 * 5 + 1), resumed.calls)
+            self.assertFalse(os.path.exists(path))
+
         
 if __name__ == "__main__":
     unittest.main()
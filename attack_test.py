@@ -0,0 +1,105 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import unittest
+import unittest.mock
+import numpy
+import attack
+import attack_on_hld
+import tropical_algebra
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def test_potentials(self):
+        P = attack.Potentials(2, 2)
+        self.assertTrue(P.add(0, 0, 1))
+        self.assertTrue(P.add(0, 1, 2))
+        self.assertTrue(P.add(1, 0, 3))
+
+        # x_1 + y_1 = (x_1 + y_0) + (x_0 + y_1) - (x_0 + y_0) = -3 - 2 + 1 = -4.
+        self.assertFalse(P.add(1, 1, 5))
+        self.assertTrue(P.add(1, 1, 4))
+        self.assertEqual(P.find(0)[0], P.find(3)[0])
+
+        # Unions after the mark are undone, so the contradicting equality is accepted then.
+        P.rollback(1)
+        self.assertEqual(1, P.mark())
+        self.assertNotEqual(P.find(0)[0], P.find(1)[0])
+        self.assertTrue(P.add(1, 1, 5))
+        self.assertTrue(P.add(0, 1, 2))
+        self.assertFalse(P.add(1, 0, 3))
+        P.rollback(0)
+        self.assertEqual([0, 1, 2, 3], [P.find(v)[0] for v in range(4)])
+
+    def test_is_consistent(self):
+        M = {(0, 0): 0, (0, 1): 0, (1, 0): 0, (1, 1): 1}
+        self.assertTrue(attack.is_consistent(
+            2, 2, M, [(0, 0), (0, 1), (1, 0)], (None, None)))
+        self.assertFalse(attack.is_consistent(
+            2, 2, M, [(0, 0), (0, 1), (1, 0), (1, 1)], (None, None)))
+        # The equalities give x_1 + y_1 = 0, which contradicts x_1 + y_1 >= 1.
+        M[(1, 1)] = -1
+        self.assertFalse(attack.is_consistent(
+            2, 2, M, [(0, 0), (0, 1), (1, 0)], (None, None)))
+
+        # x_0 + y_0 = 0 has no solution with x_0, y_0 >= 1 or x_0, y_0 <= -1.
+        M = {(0, 0): 0}
+        self.assertTrue(attack.is_consistent(1, 1, M, [(0, 0)], (-10, 10)))
+        for bounds in [(1, None), (None, -1), (1, 10)]:
+            self.assertFalse(attack.is_consistent(1, 1, M, [(0, 0)], bounds))
+            self.assertIsNone(attack.solve_by_graph(1, 1, M, [(0, 0)], bounds))
+
+    def test_enumerate_product_of_sets(self):
+        M = {(0, 0): 0, (0, 1): 0, (1, 0): 0, (1, 1): 1}
+        W = [[(0, 0), (1, 1)], [(0, 1)], [(1, 0)], [(1, 1), (0, 0)]]
+        tuples = list(attack.enumerate_product_of_sets(W))
+        self.assertEqual(4, len(tuples))
+        pruned = list(attack.enumerate_product_of_sets(W, attack.Potentials(2, 2), M))
+        self.assertEqual([S for S in tuples if attack.is_consistent(2, 2, M, S, (None, None))], pruned)
+        self.assertEqual(2, len(pruned))
+
+        # The first two sets contradict each other, so no tuple is enumerated whatever the other sets are.
+        W = [[(1, 1)], [(0, 0)], [(0, 1)], [(1, 0)]] + [[(0, 0), (0, 1)]] * 10
+        self.assertEqual([], list(attack.enumerate_product_of_sets(W, attack.Potentials(2, 2), M)))
+
+    def test_search_solution(self):
+        R = tropical_algebra.MatrixSemiring(tropical_algebra.R_min_plus(), 5)
+        attack_params = {
+            "ring": R,
+            "min_matrix_elem": 0,
+            "max_matrix_elem": 2**10,
+            "min_matrix_param": 0,
+            "max_matrix_param": 2**10,
+            "presolve": False,
+            "feasibility": "linprog",
+        }
+        instance, key = attack_on_hld.generate_instance(
+            dict(attack_params, rng=numpy.random.default_rng(17)))
+        solve = attack.solve_by_linprog
+
+        def run():
+            tuples = []
+
+            def solve_and_count(d1, d2, M, S, bounds):
+                tuples.append((M, list(S), bounds))
+                return solve(d1, d2, M, S, bounds)
+
+            with unittest.mock.patch.dict(attack.FEASIBILITY_BACKENDS, linprog=solve_and_count):
+                result = attack_on_hld.run_attack(attack_params, instance)
+            self.assertTrue(attack_on_hld.check_key(attack_params, instance, key, result))
+            return tuples
+
+        tuples = run()
+        # Tuples rejected by potentials are not passed to the solver.
+        for M, S, bounds in tuples:
+            self.assertTrue(attack.is_consistent(5, 5, M, S, bounds))
+
+        with unittest.mock.patch.object(attack, "is_consistent", lambda *args: True), \
+                unittest.mock.patch.object(attack.Potentials, "add", lambda *args: True):
+            unchecked = run()
+        self.assertLess(len(tuples), len(unchecked))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023
+
+The autotuner: it times the available backends of an operation over a range of sizes on the first use,
+saves the fastest backend for every size to a JSON profile, and answers by the profile afterwards.
+
+The profile is kept in the file given by TROPICAL3_TUNING_PROFILE or in ~/.tropical3_tuning.json.
+TROPICAL3_MUL_BACKEND and TROPICAL3_FEASIBILITY override the choice of the tuner for all calls.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+PROFILE_ENV = "TROPICAL3_TUNING_PROFILE"
+MUL_BACKEND_ENV = "TROPICAL3_MUL_BACKEND"
+FEASIBILITY_ENV = "TROPICAL3_FEASIBILITY"
+
+
+def get_profile_path():
+    """Returns the path to the tuning profile."""
+    return os.environ.get(PROFILE_ENV) or os.path.join(os.path.expanduser("~"), ".tropical3_tuning.json")
+
+
+def fastest(backends, make_args, sizes, max_time=0.05, repeat=3):
+    """
+    Times backends, a dict of functions by names, on arguments make_args(size) for every size.
+    Returns the name of the fastest backend by every size. A backend slower than max_time seconds is not timed for larger sizes.
+    """
+    best = dict()
+    active = dict(backends)
+    for size in sizes:
+        args = make_args(size)
+        times = dict()
+        for name, f in list(active.items()):
+            t = None
+            for i in range(repeat):
+                st = time.perf_counter()
+                f(*args)
+                t = min(t, time.perf_counter() - st) if t is not None else time.perf_counter() - st
+            times[name] = t
+            if t > max_time and len(active) > 1:
+                del active[name]
+        best[size] = min(times, key=times.get)
+    return best
+
+
+class Tuner:
+    """The tuning profile: the fastest backend by section (e.g., "mul"), key (e.g., the semiring) and size."""
+
+    sizes = (2, 4, 8, 16, 32, 64, 128)
+    """Sizes, for which backends are timed."""
+
+    def __init__(self, path=None):
+        self.path = path or get_profile_path()
+        self.profile = self.load()
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Returns the profile read from the file or an empty profile."""
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return dict()
+
+    def save(self):
+        """Writes the profile to a temporary file and renames it."""
+        tmp = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmp, "w") as f:
+            json.dump(self.profile, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def get(self, section, key, size, tune):
+        """
+        Returns the fastest backend for size. If the profile has no entry for section and key,
+        calls tune(sizes), which returns the fastest backend by every size, and saves the result.
+        The backend for the greatest tuned size not greater than size is returned.
+        """
+        with self.lock:
+            table = self.profile.setdefault(section, dict()).get(key)
+            if table is None:
+                table = {str(n): name for n, name in tune(self.sizes).items()}
+                self.profile[section][key] = table
+                self.save()
+        sizes = sorted(int(n) for n in table)
+        below = [n for n in sizes if n <= size]
+        return table[str(below[-1] if below else sizes[0])]
+
+
+tuners = dict()
+"""Tuners by paths to their profiles."""
+
+
+def get_tuner(path=None):
+    """Returns the tuner of the profile, it is shared by all callers in this process."""
+    path = path or get_profile_path()
+    if path not in tuners:
+        tuners[path] = Tuner(path)
+    return tuners[path]
@@ -0,0 +1,113 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import os
+import pickle
+import random
+import tempfile
+import unittest
+import unittest.mock
+import attack
+import autotune
+import matrix_tools
+import tropical_algebra
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def test_tuner(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profile.json")
+            tuner = autotune.Tuner(path)
+            calls = []
+
+            def tune(sizes):
+                calls.append(sizes)
+                return {n: "a" if n < 16 else "b" for n in sizes}
+
+            self.assertEqual("a", tuner.get("mul", "key", 1, tune))
+            self.assertEqual("a", tuner.get("mul", "key", 15, tune))
+            self.assertEqual("b", tuner.get("mul", "key", 16, tune))
+            self.assertEqual("b", tuner.get("mul", "key", 1000, tune))
+            self.assertEqual(1, len(calls))
+            self.assertEqual("b", autotune.Tuner(
+                path).get("mul", "key", 20, None))
+
+    def test_mul_backends(self):
+        with tempfile.TemporaryDirectory() as directory:
+            tuner = autotune.Tuner(os.path.join(directory, "profile.json"))
+            tuner.sizes = (2, 8)
+            R = tropical_algebra.MatrixSemiring(
+                tropical_algebra.R_min_plus(), 6, tuner=tuner)
+            P = tropical_algebra.MatrixSemiring(
+                tropical_algebra.R_min_plus(), 6, vectorized=False)
+            A = matrix_tools.generate_random_matrix(R, -100, 100)
+            B = matrix_tools.generate_random_matrix(R, -100, 100)
+            U = matrix_tools.generate_basis_upper_t_circulant_matrix(R, 5, 2)
+            p = matrix_tools.generate_random_polynomial(7, -100, 100)
+
+            for backend in [None, "auto", "loop", "sparse", "pruned", "broadcast", "tiled"]:
+                self.assertEqual(P.mul(A, B), R.mul(A, B, backend))
+                self.assertEqual(P.mul(U, B), R.mul(U, B, backend))
+                self.assertEqual(P.pwr(A, 5), R.pwr(A, 5, backend))
+                self.assertEqual(P.calc_poly(p, B),
+                                 R.calc_poly(p, B, backend))
+            self.assertEqual({"R_min_plus/dense/1", "R_min_plus/sparse/1"},
+                             set(tuner.profile["mul"]))
+
+            os.environ[autotune.MUL_BACKEND_ENV] = "loop"
+            try:
+                self.assertEqual("loop", R.get_mul_backend(A, B))
+                self.assertEqual("tiled", R.get_mul_backend(A, B, "tiled"))
+                # Backends, which a matrix semiring does not offer, are ignored, e.g., "threaded" with one thread.
+                os.environ[autotune.MUL_BACKEND_ENV] = "threaded"
+                with self.assertWarns(UserWarning):
+                    self.assertEqual(P.mul(A, B), R.mul(A, B))
+                os.environ[autotune.MUL_BACKEND_ENV] = "pruned"
+                S = tropical_algebra.MatrixSemiring(tropical_algebra.R_max_min(), 6)
+                with self.assertWarns(UserWarning):
+                    self.assertEqual("auto", S.get_mul_backend(A, B))
+                # The backend given by the argument must be offered.
+                with self.assertRaises(ValueError):
+                    S.mul(A, B, "pruned")
+            finally:
+                del os.environ[autotune.MUL_BACKEND_ENV]
+            with self.assertRaises(ValueError):
+                R.mul(A, B, "unknown")
+            # Backends are built once, the density of a dense matrix is found without its sparse form.
+            self.assertIs(R.mul_backends(), R.mul_backends())
+            self.assertIsNone(pickle.loads(pickle.dumps(R))._mul_backends)
+            with unittest.mock.patch.object(tropical_algebra.SparseMatrix, "from_dense") as from_dense:
+                R.get_mul_backend(A, B)
+                from_dense.assert_not_called()
+            self.assertTrue(R.is_sparse(U))
+            self.assertFalse(R.is_sparse(A))
+
+    def test_feasibility_backends(self):
+        for k in range(300):
+            d1 = random.randint(1, 5)
+            d2 = random.randint(1, 5)
+            M = {(i, j): random.randint(-20, 20)
+                 for i in range(d1) for j in range(d2)}
+            S = random.sample(list(M), random.randint(0, min(4, len(M))))
+            bounds = random.choice([(None, None), (-10, None), (-10, 10)])
+            result = attack.solve_by_graph(d1, d2, M, S, bounds)
+            self.assertEqual(attack.solve_by_linprog(d1, d2, M, S, bounds) is None, result is None)
+            if not attack.is_consistent(d1, d2, M, S, bounds):
+                self.assertIsNone(result)
+            if result:
+                x, y = result
+                for (i, j), m in M.items():
+                    self.assertGreaterEqual(x[i] + y[j], -m)
+                    if (i, j) in S:
+                        self.assertEqual(x[i] + y[j], -m)
+                for v in x + y:
+                    self.assertTrue(bounds[0] is None or v >= bounds[0])
+                    self.assertTrue(bounds[1] is None or v <= bounds[1])
+
+        self.assertEqual("graph", attack.get_feasibility_backend(2, 2, "graph"))
+        self.assertEqual("linprog", attack.get_feasibility_backend(2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
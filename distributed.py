@@ -0,0 +1,185 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023
+
+Runs a set of tests on several hosts. The coordinator serves jobs (protocol, params, seed, timeout) over TCP,
+workers take jobs, run experiments, and send results back:
+
+    python3 distributed.py coordinator --port=5555 hld --count=100 --timeout=60 --size=10 ...
+    python3 distributed.py worker --host=<coordinator host> --port=5555
+
+A job, the result of which is not received within its timeout plus grace seconds, is given to another worker.
+Messages are JSON objects, one per line.
+"""
+
+import argparse
+import collections
+import json
+import socket
+import socketserver
+import sys
+import threading
+import time
+import test_tools
+import tropical3
+
+
+def make_jobs(args):
+    """Returns jobs for parsed arguments of tropical3."""
+    params = {name: value for name, value in vars(args).items()
+              if name not in ("protocol", "count", "timeout")}
+    return [{"id": i, "protocol": args.protocol, "params": params, "seed": i, "timeout": args.timeout}
+            for i in range(1, args.count + 1)]
+
+
+class Coordinator:
+    """Keeps jobs, gives them to workers, and collects results."""
+
+    def __init__(self, jobs, grace=10):
+        self.jobs = {job["id"]: job for job in jobs}
+        self.pending = collections.deque(jobs)
+        self.leases = dict()
+        self.results = dict()
+        self.grace = grace
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        if not jobs:
+            self.finished.set()
+
+    def expire_leases(self):
+        """Returns jobs of dead workers to the queue."""
+        now = time.time()
+        for id, deadline in list(self.leases.items()):
+            if deadline < now:
+                del self.leases[id]
+                self.pending.append(self.jobs[id])
+
+    def get_job(self):
+        """Returns a job to run or None if there is no job now."""
+        with self.lock:
+            self.expire_leases()
+            if not self.pending:
+                return None
+            job = self.pending.popleft()
+            self.leases[job["id"]] = time.time() + job["timeout"] + self.grace
+            return job
+
+    def put_result(self, id, result):
+        """Saves the result of a job, results of jobs given to several workers are saved once."""
+        with self.lock:
+            self.leases.pop(id, None)
+            if id in self.results:
+                return
+            self.results[id] = result
+            if self.jobs[id] in self.pending:
+                self.pending.remove(self.jobs[id])
+            print(result)
+            if len(self.results) == len(self.jobs):
+                self.finished.set()
+
+    def is_finished(self):
+        return self.finished.is_set()
+
+    def handle(self, message):
+        """Returns the reply to a message of a worker."""
+        if message["type"] == "get":
+            return {"job": self.get_job(), "done": self.is_finished()}
+        if message["type"] == "result":
+            self.put_result(message["id"], message["result"])
+            return {"ok": True}
+        return {"error": "unknown message type"}
+
+    def serve(self, host, port):
+        """Starts serving workers in a thread. Returns the server."""
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    reply = coordinator.handle(json.loads(line))
+                    self.wfile.write((json.dumps(reply) + "\n").encode())
+                    self.wfile.flush()
+
+        server = socketserver.ThreadingTCPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def wait(self, timeout=None):
+        """Waits until results of all jobs are received."""
+        return self.finished.wait(timeout)
+
+
+def run_job(job):
+    """Runs the experiment of a job. Returns "OK", "FAIL" or "TIMEOUT"."""
+    protocol = tropical3.PROTOCOLS[job["protocol"]]
+    module = protocol.load()
+    instance_params, attack_params = protocol.make_params(
+        argparse.Namespace(**job["params"]))
+    return test_tools.run_one_test(module.perform_one_experiment, instance_params, attack_params, job["seed"], job["timeout"])
+
+
+def run_worker(host, port, poll=1.0):
+    """Takes jobs from the coordinator and runs them until all jobs are done. Returns the number of run jobs."""
+    count = 0
+    with socket.create_connection((host, port)) as sock:
+        f = sock.makefile("rw")
+
+        def request(message):
+            f.write(json.dumps(message) + "\n")
+            f.flush()
+            line = f.readline()
+            return json.loads(line) if line else None
+
+        while True:
+            reply = request({"type": "get"})
+            if not reply or reply["done"]:
+                return count
+            job = reply["job"]
+            if not job:
+                time.sleep(poll)
+                continue
+            request({"type": "result", "id": job["id"],
+                    "result": run_job(job)})
+            count += 1
+
+
+def get_arguments_parser():
+    parser = argparse.ArgumentParser(
+        description="The script to check the attacks on several hosts.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    coordinator = subparsers.add_parser(
+        "coordinator", help="Serve jobs, the rest arguments are arguments of tropical3",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    coordinator.add_argument(
+        "--host", help="Address to listen", default="0.0.0.0", type=str)
+    coordinator.add_argument(
+        "--port", help="Port to listen", required=True, type=int)
+    coordinator.add_argument(
+        "--grace", help="Seconds to wait a result after the timeout of a job before giving it to another worker", default=10, type=int)
+    coordinator.add_argument("tests", nargs=argparse.REMAINDER)
+
+    worker = subparsers.add_parser(
+        "worker", help="Run jobs", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    worker.add_argument(
+        "--host", help="Address of the coordinator", required=True, type=str)
+    worker.add_argument(
+        "--port", help="Port of the coordinator", required=True, type=int)
+
+    return parser
+
+
+if __name__ == "__main__":
+    args = get_arguments_parser().parse_args()
+    if args.mode == "worker":
+        run_worker(args.host, args.port)
+        sys.exit(0)
+
+    tests = tropical3.get_arguments_parser().parse_args(args.tests)
+    coordinator = Coordinator(make_jobs(tests), args.grace)
+    st = time.time()
+    server = coordinator.serve(args.host, args.port)
+    coordinator.wait()
+    et = time.time()
+    server.shutdown()
+    test_tools.print_summary(list(coordinator.results.values()), et - st)
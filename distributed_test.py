@@ -0,0 +1,47 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import unittest
+import distributed
+import tropical3
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def test_coordinator_and_workers(self):
+        args = tropical3.get_arguments_parser().parse_args(
+            ["hld", "--count=4", "--size=3", "--timeout=2", "--min_matrix_elem=-1000", "--max_matrix_elem=1000",
+             "--min_matrix_param=-1000", "--max_matrix_param=1000"])
+        jobs = distributed.make_jobs(args)
+        self.assertEqual([1, 2, 3, 4], [job["seed"] for job in jobs])
+
+        coordinator = distributed.Coordinator(jobs, grace=0)
+        server = coordinator.serve("127.0.0.1", 0)
+        port = server.server_address[1]
+
+        # A worker, which takes a job and dies.
+        with socket.create_connection(("127.0.0.1", port)) as sock:
+            f = sock.makefile("rw")
+            f.write(json.dumps({"type": "get"}) + "\n")
+            f.flush()
+            lost = json.loads(f.readline())["job"]["id"]
+
+        workers = [subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "distributed.py"), "worker", "--host=127.0.0.1", "--port=" + str(port)])
+                   for _ in range(2)]
+        self.assertTrue(coordinator.wait(60))
+        server.shutdown()
+        for worker in workers:
+            self.assertEqual(0, worker.wait(60))
+
+        self.assertEqual({1, 2, 3, 4}, set(coordinator.results))
+        self.assertIn(lost, coordinator.results)
+        self.assertEqual(["OK"] * 4, list(coordinator.results.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023
+
+Lazy expressions over a matrix semiring: matrices, products, sums and polynomials of matrices form a DAG,
+equal subexpressions are the same node, so they are evaluated once. Rows of an expression are computed
+by products of blocks of rows with factors, without computing the whole matrix, so a comparison
+with a matrix stops at the first block of rows, which differs. A polynomial of a degree greater than the size
+of matrices or of a matrix with a recorded periodicity is evaluated once by calc_poly instead.
+
+    E = Expressions(R)
+    A = E.matrix(A)
+    E.equals(E.mul(E.poly(p1, A), E.matrix(v), E.poly(p2, A)), key)
+"""
+
+
+class Expression:
+    """A node of expressions: an operation, its arguments and the value computed once."""
+
+    def __init__(self, op, args):
+        self.op = op
+        self.args = args
+        self.value = None
+
+    def __repr__(self):
+        return "Expression({}, {})".format(self.op, len(self.args))
+
+
+class Expressions:
+    """Expressions over a matrix semiring R. Nodes are kept by their operations and arguments."""
+
+    def __init__(self, R):
+        self.R = R
+        self.nodes = dict()
+
+    def node(self, op, args, key):
+        """Returns the node with the key, a new one if there is no such node."""
+        if key not in self.nodes:
+            self.nodes[key] = Expression(op, args)
+        return self.nodes[key]
+
+    def matrix(self, A):
+        """Returns the node of a matrix."""
+        A = self.R.freeze(A)
+        node = self.node("matrix", (A,), ("matrix", A))
+        node.value = A
+        return node
+
+    def mul(self, *factors):
+        """Returns the node of the product of factors, nested products are flattened."""
+        args = []
+        for f in factors:
+            args.extend(f.args if f.op == "mul" else [f])
+        if len(args) == 1:
+            return args[0]
+        return self.node("mul", tuple(args), ("mul",) + tuple(id(f) for f in args))
+
+    def sum(self, *terms):
+        """Returns the node of the sum of terms, nested sums are flattened."""
+        args = dict()
+        for t in terms:
+            args.update((id(s), s) for s in (t.args if t.op == "sum" else [t]))
+        if len(args) == 1:
+            return next(iter(args.values()))
+        key = tuple(sorted(args))
+        return self.node("sum", tuple(args[k] for k in key), ("sum",) + key)
+
+    def poly(self, p, A):
+        """Returns the node of the polynomial p of the node A."""
+        return self.node("poly", (tuple(p), A), ("poly", tuple(p), id(A)))
+
+    def evaluate(self, node):
+        """Returns the value of the node as an immutable matrix, values of nodes are computed once."""
+        if node.value is None:
+            R = self.R
+            if node.op == "mul":
+                C = self.evaluate(node.args[0])
+                for f in node.args[1:]:
+                    C = R.mul(C, self.evaluate(f))
+            elif node.op == "sum":
+                C = self.evaluate(node.args[0])
+                for t in node.args[1:]:
+                    C = R.sum(C, self.evaluate(t))
+            else:
+                p, A = node.args
+                C = R.calc_poly(list(p), self.evaluate(A))
+            node.value = R.freeze(C)
+        return node.value
+
+    def mul_rows(self, V, B):
+        """Returns the product of a block of rows V and a matrix B."""
+        K = self.R.kernels()
+        if K:
+            return K.tolist(K.mul(K.array(V), K.array(B)))
+        S = self.R.semiring
+        C = []
+        for v in V:
+            c = [S.zero()] * len(B[0])
+            for a, row in zip(v, B):
+                if a != S.zero():
+                    c = [S.sum(x, S.mul(a, b)) for x, b in zip(c, row)]
+            C.append(c)
+        return C
+
+    def sum_rows(self, V, W):
+        S = self.R.semiring
+        return [[S.sum(a, b) for a, b in zip(v, w)] for v, w in zip(V, W)]
+
+    def times(self, V, node):
+        """Returns V * node for a block of rows V, the value of node is not computed if it is not known."""
+        S = self.R.semiring
+        if node.value is not None:
+            return self.mul_rows(V, node.value)
+        if node.op == "mul":
+            for f in node.args:
+                V = self.times(V, f)
+            return V
+        if node.op == "sum":
+            C = self.times(V, node.args[0])
+            for t in node.args[1:]:
+                C = self.sum_rows(C, self.times(V, t))
+            return C
+        p, A = node.args
+        if len(p) - 1 > self.R.size() or (A.value is not None and self.R.get_periodicity(A.value)):
+            # Powers of A are periodic or repeat soon, so p(A) is computed once by calc_poly and kept.
+            return self.mul_rows(V, self.evaluate(node))
+        C = None
+        for k, c in enumerate(p):
+            if k > 0:
+                V = self.times(V, A)
+            term = [[S.mul(c, x) for x in v] for v in V]
+            C = term if C is None else self.sum_rows(C, term)
+        return C
+
+    def rows(self, node, start, stop):
+        """Returns rows start, ..., stop - 1 of the node."""
+        if node.value is not None:
+            return [list(row) for row in node.value[start:stop]]
+        if node.op == "mul":
+            V = self.rows(node.args[0], start, stop)
+            for f in node.args[1:]:
+                V = self.times(V, f)
+            return V
+        if node.op == "sum":
+            C = self.rows(node.args[0], start, stop)
+            for t in node.args[1:]:
+                C = self.sum_rows(C, self.rows(t, start, stop))
+            return C
+        return self.times([list(row) for row in self.R.one()[start:stop]], node)
+
+    def entry(self, node, i, j):
+        """Returns the entry (i, j) of the node."""
+        return self.rows(node, i, i + 1)[0][j]
+
+    def equals(self, node, B, block=1):
+        """
+        Returns True if the node is equal to the matrix B. Blocks of rows are compared until the first difference,
+        the size of a block starts from block and doubles, so that a difference is found fast and an equal matrix
+        is computed by few large blocks.
+        """
+        n = self.R.size()
+        start = 0
+        while start < n:
+            stop = min(start + block, n)
+            if self.rows(node, start, stop) != [list(row) for row in B[start:stop]]:
+                return False
+            start = stop
+            block *= 2
+        return True
@@ -0,0 +1,72 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import unittest
+import expressions
+import matrix_tools
+import tropical_algebra
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def test_expressions(self):
+        for S in [tropical_algebra.R_min_plus(), tropical_algebra.R_max_plus()]:
+            for vectorized in [True, False]:
+                R = tropical_algebra.MatrixSemiring(S, 7, vectorized=vectorized)
+                A = matrix_tools.generate_random_matrix(R, -100, 100)
+                B = matrix_tools.generate_random_matrix(R, -100, 100)
+                v = matrix_tools.generate_random_matrix(R, -100, 100)
+                p1 = matrix_tools.generate_random_polynomial(4, -100, 100)
+                p2 = matrix_tools.generate_random_polynomial(3, -100, 100)
+                K = R.mul(R.calc_poly(p1, A), R.mul(v, R.calc_poly(p2, B)))
+
+                E = expressions.Expressions(R)
+                X = E.mul(E.poly(p1, E.matrix(A)), E.mul(E.matrix(v), E.poly(p2, E.matrix(B))))
+                self.assertIs(E.poly(p1, E.matrix(A)), X.args[0])
+                self.assertEqual(3, len(X.args))
+                self.assertEqual(K[2:5], E.rows(X, 2, 5))
+                self.assertEqual(K[6][3], E.entry(X, 6, 3))
+                self.assertTrue(E.equals(X, K))
+                self.assertIsNone(X.value)
+
+                L = [row[:] for row in K]
+                L[6][6] = S.mul(L[6][6], 1)
+                self.assertFalse(E.equals(X, L))
+                self.assertEqual(K, E.evaluate(X))
+
+                Y = E.sum(E.matrix(A), E.mul(E.matrix(A), E.matrix(B)), E.matrix(A))
+                self.assertEqual(2, len(Y.args))
+                self.assertEqual(R.sum(A, R.mul(A, B)), E.evaluate(Y))
+                F = expressions.Expressions(R)
+                self.assertEqual(R.sum(A, R.mul(A, B))[1:4], F.rows(F.sum(F.matrix(A), F.mul(F.matrix(A), F.matrix(B))), 1, 4))
+
+    def test_periodic_poly(self):
+        R = tropical_algebra.MatrixSemiring(tropical_algebra.R_min_plus(), 3)
+        A = [[-42, 13, -96], [-28, 16, 65], [-85, 31, -75]]
+        v = matrix_tools.generate_random_matrix(R, -100, 100)
+        p = matrix_tools.generate_random_polynomial(300, -100, 100)
+        K = R.mul(v, R.calc_poly(p, A))
+        self.assertIsNotNone(R.get_periodicity(A))
+
+        # The polynomial is evaluated once by calc_poly and its value is shared by all blocks of rows.
+        E = expressions.Expressions(R)
+        X = E.mul(E.matrix(v), E.poly(p, E.matrix(A)))
+        self.assertTrue(E.equals(X, K))
+        self.assertEqual(R.calc_poly(p, A), X.args[1].value)
+        self.assertIsNone(X.value)
+
+        L = [row[:] for row in K]
+        L[2][2] += 1
+        self.assertFalse(E.equals(X, L))
+
+        # A polynomial of a small degree of a matrix without periodicity is multiplied by rows.
+        F = expressions.Expressions(R)
+        B = matrix_tools.generate_random_matrix(R, -100, 100)
+        Y = F.mul(F.matrix(v), F.poly(p[:3], F.matrix(B)))
+        rows = F.rows(Y, 0, 2)
+        self.assertIsNone(Y.args[1].value)
+        self.assertEqual(R.mul(v, R.calc_poly(p[:3], B))[:2], rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023
+
+Vectorized kernels for matrices over a semiring, they are generated from NumPy ufuncs declared by the semiring.
+"""
+
+import concurrent.futures
+import math
+import numpy
+
+
+class UfuncKernels:
+    """
+    Kernels for matrices over a semiring, which declares NumPy ufuncs for its sum and mul.
+    Matrices are NumPy arrays, sparse matrices are tropical_algebra.SparseMatrix.
+    Multiplication of the semiring has to be commutative.
+
+    Products, for which the broadcast temporary has more than working_set elements,
+    are computed by tiles, so that the memory is O(n^2 + working_set).
+    If threads > 1, rows of large products are split between threads, NumPy releases the GIL in ufuncs.
+    """
+
+    working_set = 2**22
+    """The default bound for the number of elements of temporary arrays of a product."""
+
+    threaded_size = 2**18
+    """Products with fewer than threaded_size multiplications of elements are computed in one thread."""
+
+    def __init__(self, semiring, working_set=None, threads=1):
+        if working_set:
+            self.working_set = working_set
+        self.threads = threads
+        self.executor = None
+        add, mul = semiring.ufuncs
+        self.add = getattr(numpy, add) if isinstance(add, str) else add
+        self.mul_ = getattr(numpy, mul) if isinstance(mul, str) else mul
+        self.zero = semiring.zero()
+        self.one = semiring.one()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["executor"] = None
+        return state
+
+    def array(self, A):
+        """Returns a matrix as a NumPy array."""
+        if hasattr(A, "todense"):
+            return numpy.asarray(A.todense(self.zero))
+        return numpy.asarray(A)
+
+    def tolist(self, C):
+        """Returns an array as a list of lists, integral elements are returned as ints."""
+        if C.dtype.kind == "f":
+            finite = numpy.isfinite(C)
+            if numpy.array_equal(C[finite], numpy.floor(C[finite])):
+                return [[int(x) if math.isfinite(x) else x for x in row] for row in C.tolist()]
+        return C.tolist()
+
+    def zero_matrix(self, n):
+        """Returns the zero matrix of size n."""
+        return numpy.full((n, n), self.zero)
+
+    def one_matrix(self, n):
+        """Returns the unit matrix of size n."""
+        U = numpy.full((n, n), self.zero)
+        numpy.fill_diagonal(U, self.one)
+        return U
+
+    def sum(self, A, B):
+        """Returns the sum of two matrices."""
+        return self.add(A, B)
+
+    def mul_by_coef(self, coef, A):
+        """Returns the product of an element of the semiring and a matrix."""
+        return self.mul_(A, coef)
+
+    def mul(self, A, B):
+        """Returns the product of two matrices."""
+        size = A.shape[0] * A.shape[1] * B.shape[1]
+        if self.threads > 1 and size >= self.threaded_size and A.shape[0] > 1:
+            return self.mul_threaded(A, B)
+        return self.mul_serial(A, B, self.working_set)
+
+    def mul_serial(self, A, B, working_set):
+        """Returns the product of two matrices computed in the current thread."""
+        if A.shape[0] * A.shape[1] * B.shape[1] > working_set:
+            return self.mul_tiled(A, B, working_set)
+        return self.mul_broadcast(A, B)
+
+    def mul_threaded(self, A, B):
+        """Returns the product of two matrices, blocks of rows of which are computed by threads."""
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(self.threads)
+        n = A.shape[0]
+        threads = min(self.threads, n)
+        C = numpy.empty((n, B.shape[1]),
+                        dtype=numpy.result_type(A, B, self.zero))
+        bounds = [n * t // threads for t in range(threads + 1)]
+
+        def mul_rows(i, j):
+            C[i:j] = self.mul_serial(A[i:j], B, self.working_set // threads)
+
+        for f in [self.executor.submit(mul_rows, i, j) for i, j in zip(bounds[:-1], bounds[1:])]:
+            f.result()
+        return C
+
+    def mul_broadcast(self, A, B):
+        """Returns the product of two matrices (or stacks of matrices) computed with one temporary array of size n^3 per product."""
+        return self.add.reduce(self.mul_(A[..., :, :, None], B[..., None, :, :]), axis=-2)
+
+    def mul_batch(self, A, B):
+        """
+        Given stacks of matrices A and B of shape batch x n x n. Returns the stack of products A[b] * B[b].
+        Products are computed by chunks of the stack, so that temporary arrays have at most working_set elements.
+        """
+        size = A.shape[1] * A.shape[2] * B.shape[2]
+        if size > self.working_set:
+            return numpy.stack([self.mul(a, b) for a, b in zip(A, B)])
+        step = self.working_set // size
+        if step >= len(A):
+            return self.mul_broadcast(A, B)
+        return numpy.concatenate([self.mul_broadcast(A[i:i + step], B[i:i + step]) for i in range(0, len(A), step)])
+
+    def tiles(self, n, m, l, working_set=None):
+        """Returns sizes of tiles by i, k, j for the product of n x m and m x l matrices."""
+        working_set = working_set or self.working_set
+        t = max(1, int(round(working_set ** (1 / 3))))
+        ti = min(n, t)
+        tk = min(m, t)
+        tj = min(l, max(t, working_set // (ti * tk)))
+        return ti, tk, tj
+
+    def mul_tiled(self, A, B, working_set=None):
+        """
+        Returns the product of two matrices computed by tiles.
+        For every tile of C, products of tiles of A and B are accumulated over blocks of k.
+        """
+        n, m = A.shape
+        l = B.shape[1]
+        ti, tk, tj = self.tiles(n, m, l, working_set)
+        C = numpy.full((n, l), self.zero,
+                       dtype=numpy.result_type(A, B, self.zero))
+        for i in range(0, n, ti):
+            for k in range(0, m, tk):
+                Ab = A[i:i + ti, k:k + tk, None]
+                for j in range(0, l, tj):
+                    Cb = C[i:i + ti, j:j + tj]
+                    self.add(Cb, self.add.reduce(self.mul_(
+                        Ab, B[None, k:k + tk, j:j + tj]), axis=1), out=Cb)
+        return C
+
+    def mul_sparse_dense(self, A, B):
+        """Returns the product of a sparse matrix A and a matrix B in O(nnz * n)."""
+        n = A.n
+        C = numpy.full((n, B.shape[1]), self.zero, dtype=numpy.result_type(
+            self.zero, B.dtype, *A.values[:1]))
+        if A.nnz() == 0:
+            return C
+        T = self.mul_(numpy.asarray(A.values)[:, None], B[A.indices, :])
+        starts = numpy.asarray(A.indptr[:-1])
+        nonempty = starts < numpy.asarray(A.indptr[1:])
+        C[nonempty] = self.add.reduceat(T, starts[nonempty], axis=0)
+        return C
+
+    def mul_dense_sparse(self, A, B):
+        """Returns the product of a matrix A and a sparse matrix B in O(n * nnz)."""
+        return self.mul_sparse_dense(B.transpose(), A.T).T
+
+    def pwr(self, A, m):
+        """Returns a matrix raised to the power m."""
+        C = self.one_matrix(A.shape[0])
+        while m > 0:
+            if m % 2 == 1:
+                C = self.mul(C, A)
+            m //= 2
+            if m > 0:
+                A = self.mul(A, A)
+        return C
+
+    def poly_from_ladder(self, coefs, ladder):
+        """Returns the sum of coefs[k] * ladder[k]."""
+        coefs = numpy.asarray(coefs)
+        return self.add.reduce(self.mul_(numpy.stack(ladder), coefs[:, None, None]), axis=0)
+
+    def calc_polys_batch(self, A, *polys):
+        """
+        Given a stack of matrices A of shape batch x n x n and stacks of polynomials of shape batch x (d + 1).
+        Returns the stack p[b](A[b]) for every stack of polynomials p, powers of A are computed once for all of them.
+        """
+        P = numpy.broadcast_to(self.one_matrix(A.shape[1]), A.shape)
+        dtype = numpy.result_type(A, self.zero, *polys)
+        results = [numpy.full(A.shape, self.zero, dtype=dtype) for p in polys]
+        for k in range(max(p.shape[1] for p in polys)):
+            if k > 0:
+                P = self.mul_batch(P, A)
+            for C, p in zip(results, polys):
+                if k < p.shape[1]:
+                    self.add(C, self.mul_(P, p[:, k, None, None]), out=C)
+        return results
+
+    def calc_poly(self, p, A):
+        """Given a matrix A and a polynomial p. Returns p(A)."""
+        ladder = [self.one_matrix(A.shape[0])]
+        for i in range(1, len(p)):
+            ladder.append(self.mul(ladder[-1], A))
+        return self.poly_from_ladder(p, ladder)
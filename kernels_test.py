@@ -0,0 +1,113 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import numpy
+import random
+import unittest
+import tropical_algebra
+import matrix_tools
+import test_tools
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def check_kernels(self, S, a_min, a_max):
+        for n in [1, 2, 5, 12]:
+            R = tropical_algebra.MatrixSemiring(S, n)
+            P = tropical_algebra.MatrixSemiring(S, n, vectorized=False)
+            self.assertIsNotNone(R.kernels())
+            self.assertIsNone(P.kernels())
+            for i in range(5):
+                A = matrix_tools.generate_random_matrix(R, a_min, a_max)
+                B = matrix_tools.generate_random_matrix(R, a_min, a_max)
+                A[random.randint(0, n - 1)][random.randint(0, n - 1)] = S.zero()
+                U = matrix_tools.generate_basis_upper_t_circulant_matrix(
+                    R, S.one(), random.randint(0, n - 1))
+                p = matrix_tools.generate_random_polynomial(
+                    random.randint(0, 10), a_min, a_max)
+
+                self.assertEqual(P.sum(A, B), R.sum(A, B))
+                self.assertEqual(P.mul_by_coef(a_max, A),
+                                 R.mul_by_coef(a_max, A))
+                self.assertEqual(P.mul(A, B), R.mul(A, B))
+                self.assertEqual(P.mul(U, B), R.mul(U, B))
+                self.assertEqual(P.mul(B, U), R.mul(B, U))
+                self.assertEqual(P.mul(U, U), R.mul(U, U))
+                self.assertEqual(P.pwr(A, 7), R.pwr(A, 7))
+                self.assertEqual(P.calc_poly(p, B), R.calc_poly(p, B))
+
+    def test_tiled_mul(self):
+        for S in [tropical_algebra.R_min_plus(), tropical_algebra.R_max_plus()]:
+            R = tropical_algebra.MatrixSemiring(S, 30, working_set=500)
+            P = tropical_algebra.MatrixSemiring(S, 30, vectorized=False)
+            self.assertEqual((8, 8, 8), R.kernels().tiles(30, 30, 30))
+            A = matrix_tools.generate_random_matrix(R, -100, 100)
+            B = matrix_tools.generate_random_matrix(R, -100, 100)
+            A[3][4] = S.zero()
+
+            self.assertEqual(P.mul(A, B), R.mul(A, B))
+            self.assertEqual(P.mul(B, A), R.mul(B, A))
+
+    def test_threaded_mul(self):
+        for S in [tropical_algebra.R_min_plus(), tropical_algebra.R_max_plus()]:
+            R = tropical_algebra.MatrixSemiring(
+                S, 30, working_set=2000, threads=3)
+            P = tropical_algebra.MatrixSemiring(S, 30, vectorized=False)
+            R.kernels().threaded_size = 1000
+            A = matrix_tools.generate_random_matrix(R, -100, 100)
+            B = matrix_tools.generate_random_matrix(R, -100, 100)
+            B[7][1] = S.zero()
+
+            self.assertEqual(P.mul(A, B), R.mul(A, B))
+            self.assertEqual(P.pwr(B, 5), R.pwr(B, 5))
+            self.assertIsNotNone(R.kernels().executor)
+
+    def test_batch(self):
+        R = tropical_algebra.MatrixSemiring(
+            tropical_algebra.R_min_plus(), 4, working_set=200)
+        P = tropical_algebra.MatrixSemiring(
+            tropical_algebra.R_min_plus(), 4, vectorized=False)
+        K = R.kernels()
+        rng = test_tools.get_random_generator(1)
+        A = matrix_tools.generate_random_matrices(R, -100, 100, 10, rng)
+        B = matrix_tools.generate_random_matrices(R, -100, 100, 10, rng)
+        p = matrix_tools.generate_random_polynomials(R, 0, 6, -100, 100, 10, rng)
+        t = rng.integers(-100, 100, size=10)
+        arrays = rng.integers(-100, 100, size=(10, 4))
+        C = K.mul_batch(A, B)
+        pA, = K.calc_polys_batch(A, p)
+        U = matrix_tools.generate_t_circulant_matrices(R, arrays, t, True)
+        L = matrix_tools.generate_t_circulant_matrices(R, arrays, t, False)
+        N = matrix_tools.generate_anti_t_p_circulant_matrices(
+            R, arrays[:, 0], t, arrays[:, 1])
+        for b in range(10):
+            coefs = [x for x in p[b].tolist() if x != R.semiring.zero()]
+            self.assertEqual(P.mul(A[b].tolist(), B[b].tolist()), C[b].tolist())
+            self.assertEqual(P.calc_poly(coefs, A[b].tolist()), K.tolist(pA[b]))
+            self.assertEqual(matrix_tools.generate_upper_t_circulant_matrix(
+                R, arrays[b].tolist(), int(t[b])), U[b].tolist())
+            self.assertEqual(matrix_tools.generate_lower_t_circulant_matrix(
+                R, arrays[b].tolist(), int(t[b])), L[b].tolist())
+            self.assertEqual(matrix_tools.generate_anti_t_p_circulant_matrix(
+                R, int(arrays[b, 0]), int(t[b]), int(arrays[b, 1])), N[b].tolist())
+        self.assertEqual([0, 3, 6, 9], matrix_tools.get_equal_matrices(
+            C, numpy.where(numpy.arange(10)[:, None, None] % 3 == 0, C, A)))
+
+    def test_min_plus_kernels(self):
+        self.check_kernels(tropical_algebra.R_min_plus(), -100, 100)
+
+    def test_max_plus_kernels(self):
+        self.check_kernels(tropical_algebra.R_max_plus(), -100, 100)
+
+    def test_max_min_kernels(self):
+        self.check_kernels(tropical_algebra.R_max_min(), -100, 100)
+
+    def test_min_max_kernels(self):
+        self.check_kernels(tropical_algebra.R_min_max(), -100, 100)
+
+    def test_max_times_kernels(self):
+        self.check_kernels(tropical_algebra.R_max_times(), 0, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,264 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023
+
+Key exchange protocols, the attacks on which are checked by the scripts, and the benchmark of key agreement:
+
+    python3 key_exchange.py gs --sizes=5,10,20 --count=100 --min_matrix_elem=-1000 ...
+
+Public parameters of a protocol are generated once, data depending only on them are precomputed.
+Every party generates its secret, sends its message, and computes the key by the message of the other party.
+"""
+
+import argparse
+import statistics
+import time
+import tropical_algebra
+import tropical3
+from matrix_tools import randint
+from matrix_tools import generate_random_matrix
+from matrix_tools import generate_random_polynomial
+from matrix_tools import generate_random_upper_t_circulant_matrix
+from matrix_tools import generate_random_lower_t_circulant_matrix
+from matrix_tools import generate_random_anti_t_p_circulant_matrix
+
+
+class Party:
+    """A party of a key exchange, e.g., Alice or Bob."""
+
+    def __init__(self, protocol, rng=None):
+        self.protocol = protocol
+        self.secret = protocol.generate_secret(rng)
+        self.message = protocol.get_message(self.secret)
+
+    def get_key(self, message):
+        """Returns the key computed by the message of the other party."""
+        return self.protocol.get_key(self.secret, message)
+
+
+class KeyExchange:
+    """Public parameters of a key exchange protocol over R and the data precomputed from them."""
+
+    def __init__(self, R, params, public):
+        self.R = R
+        self.params = params
+        self.public = public
+
+    @classmethod
+    def generate(cls, R, params, rng=None):
+        """Generates public parameters by instance parameters of the protocol."""
+        return cls(R, params, cls.generate_public(R, params, rng))
+
+    def party(self, rng=None):
+        """Returns a new party with a random secret."""
+        return Party(self, rng)
+
+    def agree(self, rng=None):
+        """Runs the key exchange between Alice and Bob. Returns both parties."""
+        alice = self.party(rng)
+        bob = self.party(rng)
+        return alice, bob
+
+
+class GrigorievShpilrain(KeyExchange):
+    """
+    The protocol from D. Grigoriev, V. Shpilrain, "Tropical cryptography", Section 2.
+    Powers of public matrices A and B up to max_poly_deg are precomputed.
+    """
+
+    @staticmethod
+    def generate_public(R, params, rng=None):
+        return {
+            "A": R.freeze(generate_random_matrix(R, params["min_matrix_elem"], params["max_matrix_elem"], rng)),
+            "B": R.freeze(generate_random_matrix(R, params["min_matrix_elem"], params["max_matrix_elem"], rng)),
+        }
+
+    def __init__(self, R, params, public):
+        super().__init__(R, params, public)
+        self.powers_A = [R.freeze(R.pwr(public["A"], 0))]
+        self.powers_B = [R.freeze(R.pwr(public["B"], 0))]
+        for i in range(params["max_poly_deg"]):
+            self.powers_A.append(R.freeze(R.mul(self.powers_A[-1], public["A"])))
+            self.powers_B.append(R.freeze(R.mul(self.powers_B[-1], public["B"])))
+
+    def generate_secret(self, rng=None):
+        p = self.params
+        return tuple(generate_random_polynomial(randint(p["min_poly_deg"], p["max_poly_deg"], rng),
+                                                p["min_poly_coef"], p["max_poly_coef"], rng) for i in range(2))
+
+    def calc_polys(self, secret):
+        """Returns p1(A) and p2(B) for the secret (p1, p2)."""
+        p1, p2 = secret
+        return (self.R.poly_from_ladder(p1, self.powers_A[:len(p1)]),
+                self.R.poly_from_ladder(p2, self.powers_B[:len(p2)]))
+
+    def get_message(self, secret):
+        return self.R.mul(*self.calc_polys(secret))
+
+    def get_key(self, secret, message):
+        P1, P2 = self.calc_polys(secret)
+        return self.R.freeze(self.R.mul(P1, self.R.mul(message, P2)))
+
+
+class Durcheva(KeyExchange):
+    """
+    The protocol from M. I. Durcheva, "TrES: Tropical Encryption Scheme Based on Double Key Exchange", the second step.
+    Powers of the public matrix M up to max_poly_deg are precomputed.
+    """
+
+    @staticmethod
+    def generate_public(R, params, rng=None):
+        return {
+            "M": R.freeze(generate_random_matrix(R, params["min_matrix_elem"], params["max_matrix_elem"], rng)),
+            "L": R.freeze(generate_random_matrix(R, params["min_matrix_elem"], params["max_matrix_elem"], rng)),
+        }
+
+    def __init__(self, R, params, public):
+        super().__init__(R, params, public)
+        self.powers = [R.freeze(R.pwr(public["M"], 0))]
+        for i in range(params["max_poly_deg"]):
+            self.powers.append(R.freeze(R.mul(self.powers[-1], public["M"])))
+
+    def generate_secret(self, rng=None):
+        p = self.params
+        return tuple(generate_random_polynomial(randint(p["min_poly_deg"], p["max_poly_deg"], rng),
+                                                p["min_poly_coef"], p["max_poly_coef"], rng) for i in range(2))
+
+    def calc_polys(self, secret):
+        """Returns p1(M) and p2(M) for the secret (p1, p2)."""
+        return tuple(self.R.poly_from_ladder(p, self.powers[:len(p)]) for p in secret)
+
+    def get_message(self, secret):
+        P1, P2 = self.calc_polys(secret)
+        return self.R.mul(self.R.mul(P1, self.public["L"]), P2)
+
+    def get_key(self, secret, message):
+        P1, P2 = self.calc_polys(secret)
+        return self.R.freeze(self.R.mul(P1, self.R.mul(message, P2)))
+
+
+class TwoSidedKeyExchange(KeyExchange):
+    """A protocol, in which a party sends P * Y * Q and computes the key P * K * Q by the message K."""
+
+    @staticmethod
+    def generate_public(R, params, rng=None):
+        return {
+            "Y": R.freeze(generate_random_matrix(R, params["min_matrix_elem"], params["max_matrix_elem"], rng)),
+            "s": randint(params["min_matrix_param"], params["max_matrix_param"], rng),
+            "t": randint(params["min_matrix_param"], params["max_matrix_param"], rng),
+        }
+
+    def get_message(self, secret):
+        return self.R.mul(secret[0], self.R.mul(self.public["Y"], secret[1]))
+
+    def get_key(self, secret, message):
+        return self.R.freeze(self.R.mul(secret[0], self.R.mul(message, secret[1])))
+
+
+class HuangLiDeng(TwoSidedKeyExchange):
+    """The protocol from H. Huang, C. Li, L. Deng, on upper-t-circulant matrices."""
+
+    def generate_secret(self, rng=None):
+        mm = self.params["min_matrix_elem"]
+        mM = self.params["max_matrix_elem"]
+        return (generate_random_upper_t_circulant_matrix(self.R, self.public["s"], mm, mM, rng),
+                generate_random_upper_t_circulant_matrix(self.R, self.public["t"], mm, mM, rng))
+
+
+class AmuthaPerumal1(TwoSidedKeyExchange):
+    """Protocol 1 from B. Amutha and R. Perumal, on lower-t-circulant matrices."""
+
+    def generate_secret(self, rng=None):
+        mm = self.params["min_matrix_elem"]
+        mM = self.params["max_matrix_elem"]
+        return (generate_random_lower_t_circulant_matrix(self.R, self.public["s"], mm, mM, rng),
+                generate_random_lower_t_circulant_matrix(self.R, self.public["t"], mm, mM, rng))
+
+
+class AmuthaPerumal2(TwoSidedKeyExchange):
+    """Protocol 2 from B. Amutha and R. Perumal, on anti-t-p-circulant matrices."""
+
+    @staticmethod
+    def generate_public(R, params, rng=None):
+        public = TwoSidedKeyExchange.generate_public(R, params, rng)
+        public["p"] = randint(
+            params["min_matrix_step"], params["max_matrix_step"], rng)
+        return public
+
+    def generate_secret(self, rng=None):
+        mm = self.params["min_matrix_elem"]
+        mM = self.params["max_matrix_elem"]
+        p = self.public["p"]
+        return (generate_random_anti_t_p_circulant_matrix(self.R, self.public["s"], p, mm, mM, rng),
+                generate_random_anti_t_p_circulant_matrix(self.R, self.public["t"], p, mm, mM, rng))
+
+
+KEY_EXCHANGES = {
+    "gs": GrigorievShpilrain,
+    "d": Durcheva,
+    "hld": HuangLiDeng,
+    "ap_1": AmuthaPerumal1,
+    "ap_2": AmuthaPerumal2,
+}
+"""Key exchange protocols by the names of protocols in tropical3."""
+
+
+def benchmark(protocol, instance_params, count, rng=None):
+    """
+    Generates public parameters and runs count key agreements.
+    Returns the time of setup, latencies of agreements, and the number of agreements with different keys.
+    """
+    st = time.perf_counter()
+    key_exchange = KEY_EXCHANGES[protocol].generate(
+        instance_params["ring"], instance_params, rng)
+    setup = time.perf_counter() - st
+
+    latencies = []
+    failures = 0
+    for i in range(count):
+        st = time.perf_counter()
+        alice, bob = key_exchange.agree(rng)
+        KA = alice.get_key(bob.message)
+        KB = bob.get_key(alice.message)
+        latencies.append(time.perf_counter() - st)
+        failures += KA != KB
+    return setup, latencies, failures
+
+
+def print_benchmark(n, setup, latencies, failures):
+    """Prints latency and throughput of key agreements for matrices of size n."""
+    latencies = sorted(latencies)
+    print("n = {}: setup {:.6f} s, latency mean {:.6f} s, median {:.6f} s, max {:.6f} s, throughput {:.1f} keys/s, different keys {}".format(
+        n, setup, statistics.mean(latencies), statistics.median(latencies), latencies[-1], len(latencies) / sum(latencies), failures))
+
+
+def get_arguments_parser():
+    parser = argparse.ArgumentParser(
+        description="The benchmark of key agreement.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    subparsers = parser.add_subparsers(
+        dest="protocol", metavar="protocol", required=True)
+    for name, protocol in tropical3.PROTOCOLS.items():
+        subparser = subparsers.add_parser(
+            name, help="The protocol from " + protocol.module + ".py",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+        subparser.add_argument(
+            "--sizes", help="Comma-separated sizes of matrices", required=True, type=str)
+        subparser.add_argument(
+            "--count", help="Number of key agreements for every size", default=100, type=int)
+        for arg in protocol.instance_params:
+            subparser.add_argument(
+                "--" + arg, help=tropical3.ARGUMENTS[arg], required=True, type=int)
+    return parser
+
+
+if __name__ == "__main__":
+    import test_tools
+
+    args = get_arguments_parser().parse_args()
+    protocol = tropical3.PROTOCOLS[args.protocol]
+    for n in [int(size) for size in args.sizes.split(",")]:
+        instance_params = {"ring": tropical_algebra.MatrixSemiring(
+            tropical_algebra.R_min_plus(), n)}
+        instance_params.update((name, getattr(args, name))
+                               for name in protocol.instance_params)
+        print_benchmark(n, *benchmark(args.protocol, instance_params,
+                        args.count, test_tools.get_random_generator(n)))
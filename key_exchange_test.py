@@ -0,0 +1,36 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import unittest
+import key_exchange
+import test_tools
+import tropical_algebra
+import tropical3
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def test_key_exchange(self):
+        params = {"min_matrix_elem": -100, "max_matrix_elem": 100, "min_poly_deg": 1, "max_poly_deg": 10,
+                  "min_poly_coef": -100, "max_poly_coef": 100, "min_matrix_param": -100, "max_matrix_param": 100,
+                  "min_matrix_step": -5, "max_matrix_step": 5}
+        for name in tropical3.PROTOCOLS:
+            R = tropical_algebra.MatrixSemiring(
+                tropical_algebra.R_min_plus(), 6)
+            instance_params = dict(params, ring=R)
+            rng = test_tools.get_random_generator(1)
+            protocol = key_exchange.KEY_EXCHANGES[name].generate(
+                R, instance_params, rng)
+            alice, bob = protocol.agree(rng)
+            self.assertEqual(alice.get_key(bob.message),
+                             bob.get_key(alice.message))
+            self.assertNotEqual(alice.message, bob.message)
+
+            setup, latencies, failures = key_exchange.benchmark(
+                name, instance_params, 5, rng)
+            self.assertEqual(5, len(latencies))
+            self.assertEqual(0, failures)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,19 +2,74 @@
 (c) I. Buchinskiy, M. Kotov, A. Treier, 2023
 """
 
+import collections
 import random
 import tropical_algebra
 
 
-def generate_random_matrix(R, mm, mM):
-    """Generates a random matrix A in Mat(ZZ, n), a_ij in [mm, mM]."""
+def randint(a, b, rng=None):
+    """
+    Returns a random integer in [a, b].
+    It is generated by rng, a numpy.random.Generator, or by the module random if rng is None.
+    """
+    if rng is None:
+        return random.randint(a, b)
+    return int(rng.integers(a, b, endpoint=True))
+
+
+def randints(a, b, size, rng=None):
+    """Returns a list of size random integers in [a, b] generated by rng or by the module random if rng is None."""
+    if rng is None:
+        return [random.randint(a, b) for i in range(size)]
+    return rng.integers(a, b, size=size, endpoint=True).tolist()
+
+
+def generate_random_matrix(R, mm, mM, rng=None):
+    """
+    Generates a random matrix A in Mat(ZZ, n), a_ij in [mm, mM].
+    If rng, a numpy.random.Generator, is given, all elements are generated by one call.
+    """
+    n = R.size()
+    if rng is None:
+        return [[random.randint(mm, mM) for j in range(n)] for i in range(n)]
+    return rng.integers(mm, mM, size=(n, n), endpoint=True).tolist()
+
+
+def default_rng(rng=None):
+    """Returns rng or, if it is None, a new numpy.random.Generator."""
+    if rng is None:
+        import numpy
+
+        rng = numpy.random.default_rng()
+    return rng
+
+
+def get_equal_matrices(A, B):
+    """Given stacks of matrices A and B of shape count x n x n. Returns the list of indexes b such that A[b] = B[b]."""
+    return (A == B).all(axis=(1, 2)).nonzero()[0].tolist()
+
+
+def generate_random_matrices(R, mm, mM, count, rng):
+    """Generates count random matrices in Mat(ZZ, n), a_ij in [mm, mM], by one call of rng. Returns an array count x n x n."""
     n = R.size()
-    return [[random.randint(mm, mM) for j in range(n)] for i in range(n)]
+    return rng.integers(mm, mM, size=(count, n, n), endpoint=True)
 
 
-def generate_random_polynomial(D, pm, pM):
+def generate_random_polynomial(D, pm, pM, rng=None):
     """Generates a random polynomial p in ZZ[x] of degree d, d in [1, D], p_i in [pm, pM]."""
-    return [random.randint(pm, pM) for i in range(D + 1)]
+    return randints(pm, pM, D + 1, rng)
+
+
+def generate_random_polynomials(R, dm, dM, pm, pM, count, rng):
+    """
+    Generates count random polynomials of degrees in [dm, dM], p_i in [pm, pM].
+    Returns an array count x (dM + 1), coefficients of higher degrees are the zero of the semiring.
+    """
+    import numpy
+
+    D = rng.integers(dm, dM, size=count, endpoint=True)
+    P = rng.integers(pm, pM, size=(count, dM + 1), endpoint=True)
+    return numpy.where(numpy.arange(dM + 1) <= D[:, None], P, R.semiring.zero())
 
 
 def subtract_matrix_from_matrix(A, B):
@@ -37,10 +92,18 @@ def get_minimum_of_matrix(A):
     return m, inds
 
 
+def has_division(R):
+    """Returns True if the semiring of R has division, so that matrices can be normalized up to a const."""
+    return type(R.semiring).div is not tropical_algebra.Semiring.div
+
+
 def is_matrix_minus_matrix_const(R, A, B):
     """
     If A - B is a const, then returns this const. Returns None otherwise.
     """
+    if isinstance(A, tropical_algebra.Matrix) and isinstance(B, tropical_algebra.Matrix) and has_division(R):
+        if A.normalized_hash(R.semiring) != B.normalized_hash(R.semiring):
+            return None
     n = len(A)
     ra = None
     rb = None
@@ -75,25 +138,25 @@ def is_matrix_minus_matrix_const(R, A, B):
 def is_matrix_repeated(R, As):
     """
     Returns True iff the last matrix is const * As[i] for some i < len(As) - 1.
+    If the semiring has division, matrices are compared up to a const by their normalized forms,
+    which are cached for immutable matrices.
     """
-    for i in range(len(As) - 1):
-        if is_matrix_minus_matrix_const(R, As[-1], As[i]):
-            return True
-
-    return False
+    if not has_division(R):
+        return any(is_matrix_minus_matrix_const(R, As[-1], As[i]) is not None for i in range(len(As) - 1))
+    N = R.normalize(As[-1])[1]
+    return any(R.normalize(As[i])[1] == N for i in range(len(As) - 1))
 
 
 def get_first_repeated(R, A, bound):
     """
-    For a matrix A, returns n s. t. A^n = A^m, m < n.
+    For a matrix A, returns n s. t. A^n = const * A^m, 0 < m < n < bound.
+    The periodicity of A is recorded in R, so that powers and polynomials of A are computed faster.
     """
-    As = [A]
-    for i in range(2, bound):
-        As.append(R.mul(As[-1], A))
-        if is_matrix_repeated(R, As):
-            return i
-
-    return None
+    P = R.find_periodicity(A, bound - 1)
+    if not P:
+        return None
+    n = max(P.transient, 1) + P.cyclicity
+    return n if n < bound else None
 
 
 def generate_upper_t_circulant_matrix(R, array, t):
@@ -103,13 +166,25 @@ def generate_upper_t_circulant_matrix(R, array, t):
     return [[R.semiring.mul(array[(i - j + n) % n], t if j > i else one) for j in range(n)] for i in range(n)]
 
 
-def generate_random_upper_t_circulant_matrix(R, t, a_min, a_max):
+def generate_random_upper_t_circulant_matrix(R, t, a_min, a_max, rng=None):
     """Generates an upper-t-circulant matrix of size n x n."""
-    n = R.size()
-    array = [random.randint(a_min, a_max) for i in range(n)]
+    array = randints(a_min, a_max, R.size(), rng)
     return generate_upper_t_circulant_matrix(R, array, t)
 
 
+def generate_t_circulant_matrices(R, arrays, ts, upper):
+    """
+    Generates upper-t-circulant (or lower-t-circulant if upper is False) matrices of size n x n
+    by rows of arrays and elements of ts. Returns an array count x n x n.
+    """
+    import numpy
+
+    n = R.size()
+    i, j = numpy.indices((n, n))
+    mask = j > i if upper else j < i
+    return R.kernels().mul_(arrays[:, (i - j) % n], numpy.where(mask, ts[:, None, None], R.semiring.one()))
+
+
 def generate_basis_upper_t_circulant_matrix(R, t, k):
     """Generates k-th basis upper-t-circulant matrix of size n x n."""
     n = R.size()
@@ -140,10 +215,9 @@ def generate_lower_t_circulant_matrix(R, array, t):
     return [[R.semiring.mul(array[(i - j + n) % n], t if j < i else one) for j in range(n)] for i in range(n)]
 
 
-def generate_random_lower_t_circulant_matrix(R, t, a_min, a_max):
+def generate_random_lower_t_circulant_matrix(R, t, a_min, a_max, rng=None):
     """Generates a lower-t-circulant matrix of size n x n."""
-    n = R.size()
-    array = [random.randint(a_min, a_max) for i in range(n)]
+    array = randints(a_min, a_max, R.size(), rng)
     return generate_lower_t_circulant_matrix(R, array, t)
 
 
@@ -178,12 +252,100 @@ def generate_anti_t_p_circulant_matrix(R, c_1, t, p):
     return [[R.semiring.mul(array[(i - j + n) % n], t if i + j != n - 1 else one) for j in range(n)] for i in range(n)]
 
 
-def generate_random_anti_t_p_circulant_matrix(R, t, p, a_min, a_max):
+def generate_random_anti_t_p_circulant_matrix(R, t, p, a_min, a_max, rng=None):
     """Generates an anti-t-p-circulant matrix of size n x n."""
-    c_1 = random.randint(a_min, a_max)
+    c_1 = randint(a_min, a_max, rng)
     return generate_anti_t_p_circulant_matrix(R, c_1, t, p)
 
 
+def generate_anti_t_p_circulant_matrices(R, c_1s, ts, ps):
+    """Generates anti-t-p-circulant matrices of size n x n by elements of c_1s, ts and ps. Returns an array count x n x n."""
+    import numpy
+
+    n = R.size()
+    i, j = numpy.indices((n, n))
+    arrays = c_1s[:, None] - ps[:, None] * numpy.arange(n)
+    return R.kernels().mul_(arrays[:, (i - j) % n], numpy.where(i + j != n - 1, ts[:, None, None], R.semiring.one()))
+
+
 def generate_basis_anti_t_p_circulant_matrix(R, t, p):
     """Generates basis anti-t-p-circulant matrix of size n x n."""
     return generate_anti_t_p_circulant_matrix(R, 0, t, p)
+
+
+max_basis_matrices = 1024
+"""The number of basis matrices kept by get_basis_matrix."""
+
+basis_matrices = collections.OrderedDict()
+"""Basis matrices by (kind, semiring, n, t, p, k)."""
+
+
+def get_basis_matrix(R, kind, t, p=None, k=0):
+    """
+    Returns the k-th basis "upper" or "lower" t-circulant matrix or the basis "anti" t-p-circulant matrix as an immutable matrix.
+    Matrices are generated once and kept in a bounded cache.
+    """
+    key = (kind, type(R.semiring).__name__, R.size(), t, p, k)
+    if key in basis_matrices:
+        basis_matrices.move_to_end(key)
+        return basis_matrices[key]
+
+    if kind == "upper":
+        B = generate_basis_upper_t_circulant_matrix(R, t, k)
+    elif kind == "lower":
+        B = generate_basis_lower_t_circulant_matrix(R, t, k)
+    else:
+        B = generate_basis_anti_t_p_circulant_matrix(R, t, p)
+    if len(basis_matrices) >= max_basis_matrices:
+        basis_matrices.popitem(last=False)
+    basis_matrices[key] = R.freeze(B)
+    return basis_matrices[key]
+
+
+class BasisProducts:
+    """
+    Products B_i * Y * C_j for a fixed matrix Y, where B_i and C_j are basis matrices of a kind with parameters s and t.
+    Products B_i * Y are computed once for every i. If keep is true, products B_i * Y * C_j are kept too,
+    so that they are computed once when the same public Y, s and t are attacked again.
+    """
+
+    def __init__(self, R, kind, s, t, Y, p=None, keep=False):
+        self.R = R
+        self.kind = kind
+        self.s = s
+        self.t = t
+        self.Y = Y
+        self.p = p
+        self.left = dict()
+        self.products = dict() if keep else None
+
+    def mul_left(self, i):
+        """Returns B_i * Y."""
+        if i not in self.left:
+            if self.kind == "upper":
+                BY = mul_basis_upper_t_circulant_matrix_and_matrix(
+                    self.R, self.s, i, self.Y)
+            elif self.kind == "lower":
+                BY = mul_basis_lower_t_circulant_matrix_and_matrix(
+                    self.R, self.s, i, self.Y)
+            else:
+                BY = self.R.mul(get_basis_matrix(
+                    self.R, self.kind, self.s, self.p), self.Y)
+            self.left[i] = BY
+        return self.left[i]
+
+    def __call__(self, i, j):
+        """Returns B_i * Y * C_j."""
+        if self.products is None:
+            return self.compute(i, j)
+        if (i, j) not in self.products:
+            self.products[(i, j)] = self.compute(i, j)
+        return self.products[(i, j)]
+
+    def compute(self, i, j):
+        BY = self.mul_left(i)
+        if self.kind == "upper":
+            return mul_matrix_and_basis_upper_t_circulant_matrix(self.R, self.t, j, BY)
+        if self.kind == "lower":
+            return mul_matrix_and_basis_lower_t_circulant_matrix(self.R, self.t, j, BY)
+        return self.R.mul(BY, get_basis_matrix(self.R, self.kind, self.t, self.p))
@@ -0,0 +1,94 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023
+
+Powers of matrices stored in memory-mapped .npy files.
+"""
+
+import collections
+import hashlib
+import os
+import tropical_algebra
+
+
+class PowerCache:
+    """
+    Powers A^0, A^1, ... of a matrix A, cache[i] is A^i.
+
+    If a directory is given, every computed power is saved to a .npy file named by the hash of A,
+    so that processes on the same host map the same files read-only instead of computing them again.
+    Then powers are read-only memory-mapped arrays, their pages are shared between processes,
+    at most capacity of them are kept open. Without a directory, all powers are kept in memory as lists.
+    """
+
+    def __init__(self, R, A, directory=None, capacity=16):
+        self.R = R
+        self.A = tropical_algebra.Matrix(A)
+        self.directory = directory
+        self.capacity = capacity
+        self.powers = collections.OrderedDict()
+        self.key = hashlib.sha1(repr(
+            (type(R.semiring).__name__, R.size(), self.A)).encode()).hexdigest()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, i):
+        """Returns the path to the file of A^i."""
+        return os.path.join(self.directory, "{}_{}.npy".format(self.key, i))
+
+    def __getitem__(self, i):
+        """Returns A^i, a read-only memory-mapped array if there is a directory."""
+        if i in self.powers:
+            self.powers.move_to_end(i)
+            return self.powers[i]
+
+        A = self.load(i)
+        if A is None:
+            A = self.compute(i)
+        self.put(i, A)
+        return self.powers[i]
+
+    def __contains__(self, i):
+        return i in self.powers or (self.directory is not None and os.path.exists(self.path(i)))
+
+    def compute(self, i):
+        """Computes A^i from the greatest available power A^j, j < i."""
+        if self.R.get_periodicity(self.A) or i == 0:
+            return self.R.pwr(self.A, i)
+
+        j = i - 1
+        while j > 0 and j not in self:
+            j -= 1
+        B = self[j]
+        for k in range(j + 1, i):
+            B = self.R.mul(B, self.A)
+            self.put(k, B)
+        return self.R.mul(B, self.A)
+
+    def put(self, i, A):
+        """Keeps A^i in memory and, if there is a directory, saves it to the file and keeps the mapped file instead."""
+        if self.directory:
+            if not os.path.exists(self.path(i)):
+                self.save(i, A)
+            if not hasattr(A, "dtype"):
+                A = self.load(i)
+            if len(self.powers) >= self.capacity:
+                self.powers.popitem(last=False)
+        self.powers[i] = A
+
+    def save(self, i, A):
+        """Writes A^i to a temporary file and renames it, so other processes never see a partial file."""
+        import numpy
+
+        path = self.path(i)
+        tmp = "{}.{}.tmp.npy".format(path[:-len(".npy")], os.getpid())
+        numpy.save(tmp, numpy.array(A))
+        os.replace(tmp, path)
+
+    def load(self, i):
+        """Returns A^i as a read-only array mapped to the file or None if there is no file."""
+        if not self.directory or not os.path.exists(self.path(i)):
+            return None
+
+        import numpy
+
+        return numpy.load(self.path(i), mmap_mode="r")
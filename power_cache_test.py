@@ -0,0 +1,51 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import os
+import tempfile
+import unittest
+import numpy
+import tropical_algebra
+import matrix_tools
+from power_cache import PowerCache
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def test_power_cache(self):
+        R = tropical_algebra.MatrixSemiring(
+            tropical_algebra.R_min_plus(), 5)
+        A = matrix_tools.generate_random_matrix(R, -100, 100)
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = PowerCache(R, A, directory, capacity=3)
+            for i in [7, 0, 3, 10]:
+                self.assertIsInstance(cache[i], numpy.memmap)
+                self.assertFalse(cache[i].flags.writeable)
+                self.assertEqual(R._pwr(A, i), cache[i].tolist())
+            self.assertEqual(3, len(cache.powers))
+            self.assertTrue(all(isinstance(P, numpy.memmap) for P in cache.powers.values()))
+            self.assertEqual(11, len(os.listdir(directory)))
+
+            other = PowerCache(R, A, directory, capacity=3)
+            self.assertEqual(cache.key, other.key)
+            self.assertIsInstance(other.load(9), numpy.memmap)
+            self.assertEqual(R._pwr(A, 9), other[9].tolist())
+            self.assertEqual(R._pwr(A, 12), other[12].tolist())
+            self.assertEqual(13, len(os.listdir(directory)))
+            # Products take mapped powers as they are.
+            self.assertEqual(R.mul(R._pwr(A, 3), R._pwr(A, 9)), R.mul(other[3], other[9]))
+
+    def test_power_cache_in_memory(self):
+        R = tropical_algebra.MatrixSemiring(
+            tropical_algebra.R_max_plus(), 4)
+        A = matrix_tools.generate_random_matrix(R, -100, 100)
+
+        cache = PowerCache(R, A, capacity=3)
+        for i in range(10):
+            self.assertEqual(R._pwr(A, i), cache[i])
+        self.assertEqual(10, len(cache.powers))
+
+
+if __name__ == "__main__":
+    unittest.main()
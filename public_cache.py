@@ -0,0 +1,89 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023
+
+Data derived from public parameters of protocols, e.g., powers of public matrices and basis products.
+Attacks on transcripts sharing public parameters take these data from the cache of the process
+instead of computing them again. Keys are tuples of the name of data and public parameters,
+where matrices are immutable, so equal parameters give the same key whatever transcript they come from.
+"""
+
+import collections
+
+
+ELEMENT_SIZE = 36
+"""The approximate size of an element of a matrix in bytes: a pointer in the list and an int object."""
+
+
+def get_matrices_size(R, count):
+    """Returns the approximate size in bytes of count matrices over R."""
+    return count * R.size() ** 2 * ELEMENT_SIZE
+
+
+def fits(R, count):
+    """Returns True if count matrices over R can be kept in the cache of this process."""
+    return get_matrices_size(R, count) <= public_cache.max_bytes
+
+
+class PublicCache:
+    """
+    Values by content keys with their approximate sizes in bytes. Values are computed on the first request,
+    the least recently used ones are evicted when their total size exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self.values = collections.OrderedDict()
+        self.sizes = dict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute, size):
+        """Returns the value by key, compute() is called to get the value of size bytes if there is no value yet."""
+        if key in self.values:
+            return self.find(key)
+
+        self.misses += 1
+        value = compute()
+        self.put(key, value, size)
+        return value
+
+    def find(self, key):
+        """Returns the value by key or None if there is no value."""
+        if key not in self.values:
+            return None
+        self.values.move_to_end(key)
+        self.hits += 1
+        return self.values[key]
+
+    def put(self, key, value, size):
+        """Keeps the value of size bytes by key evicting the least recently used values, a value larger than the cache is not kept."""
+        if size > self.max_bytes:
+            return
+        if key in self.values:
+            self.bytes -= self.sizes.pop(key)
+            del self.values[key]
+        while self.bytes + size > self.max_bytes:
+            old, _ = self.values.popitem(last=False)
+            self.bytes -= self.sizes.pop(old)
+        self.values[key] = value
+        self.sizes[key] = size
+        self.bytes += size
+
+    def clear(self):
+        self.values.clear()
+        self.sizes.clear()
+        self.bytes = 0
+
+
+public_cache = PublicCache()
+"""The cache of this process, every worker process has its own one."""
+
+
+def get_derived(name, R, params, compute, count):
+    """
+    Returns the data called name derived from public parameters over R, matrices in params must be immutable.
+    The data are computed by compute() if they are not in the cache, they take up to count matrices.
+    """
+    key = (name, type(R.semiring).__name__, R.size()) + tuple(params)
+    return public_cache.get(key, compute, get_matrices_size(R, count))
@@ -0,0 +1,51 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import unittest
+import public_cache
+import tropical_algebra
+from matrix_tools import BasisProducts
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def test_public_cache(self):
+        cache = public_cache.PublicCache(max_bytes=100)
+        calls = []
+
+        def compute(value):
+            calls.append(value)
+            return value
+
+        self.assertEqual("a", cache.get("a", lambda: compute("a"), 40))
+        self.assertEqual("b", cache.get("b", lambda: compute("b"), 40))
+        self.assertEqual("a", cache.get("a", lambda: compute("a"), 40))
+        self.assertEqual(["a", "b"], calls)
+        self.assertEqual(1, cache.hits)
+
+        # "b" is the least recently used value, it is evicted.
+        cache.get("c", lambda: compute("c"), 40)
+        self.assertEqual(["a", "c"], list(cache.values))
+        self.assertEqual(80, cache.bytes)
+
+        # A value larger than the cache is returned but not kept.
+        cache.get("d", lambda: compute("d"), 200)
+        self.assertEqual(["a", "c"], list(cache.values))
+
+    def test_get_derived(self):
+        R = tropical_algebra.MatrixSemiring(tropical_algebra.R_min_plus(), 3)
+        Y = [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+        public_cache.public_cache.clear()
+        products = public_cache.get_derived("BasisProducts", R, ("upper", 1, 2, R.freeze(Y)),
+                                            lambda: BasisProducts(R, "upper", 1, 2, Y, keep=True), 12)
+        # Equal public parameters from another transcript give the same data.
+        self.assertIs(products, public_cache.get_derived(
+            "BasisProducts", R, ("upper", 1, 2, R.freeze([list(row) for row in Y])), lambda: None, 12))
+        self.assertEqual(BasisProducts(R, "upper", 1, 2, Y)(1, 2), products(1, 2))
+        self.assertIs(products(1, 2), products(1, 2))
+        self.assertTrue(public_cache.fits(R, 12))
+        self.assertFalse(public_cache.fits(R, 10**9))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023
+
+Residuation over selective semirings with division, e.g., min-plus and max-plus.
+For min-plus, A \\ B is the least X such that A * X >= B, and A * X = B has a solution iff X = A \\ B is a solution.
+For max-plus, it is the greatest X such that A * X <= B. Matrices may be rectangular.
+The exception is an entry x_kj, which nothing constrains, since the k-th column of A is zero: it is zero in A \\ B,
+i.e., +inf for min-plus and -inf for max-plus, instead of the least (the greatest) value. It does not change A * X.
+"""
+
+
+def get_dual_sum(semiring):
+    """Returns the dual sum of a selective semiring, i.e., max for min-plus and min for max-plus."""
+    def dual_sum(a, b):
+        return b if semiring.sum(a, b) == a else a
+
+    return dual_sum
+
+
+def residual_element(semiring, terms):
+    """Returns the dual sum of b / a over pairs (a, b), pairs with a = zero do not constrain the result, it is zero without constraints."""
+    dual_sum = get_dual_sum(semiring)
+    zero = semiring.zero()
+    x = None
+    for a, b in terms:
+        if a == zero:
+            continue
+        c = semiring.div(b, a)
+        x = c if x is None else dual_sum(x, c)
+    return zero if x is None else x
+
+
+def left_residual(R, A, B):
+    """Returns A \\ B for A of size m x k and B of size m x l, rows of zero columns of A are zero."""
+    return [[residual_element(R.semiring, [(A[i][k], B[i][j]) for i in range(len(A))])
+             for j in range(len(B[0]))] for k in range(len(A[0]))]
+
+
+def right_residual(R, B, A):
+    """
+    Returns B / A for B of size m x l and A of size k x l, for min-plus it is the least X such that X * A >= B,
+    columns of X for zero rows of A are zero.
+    """
+    return [[residual_element(R.semiring, [(A[k][j], B[i][j]) for j in range(len(B[0]))])
+             for k in range(len(A))] for i in range(len(B))]
+
+
+def mul(R, A, B):
+    """Returns the product of rectangular matrices A and B."""
+    S = R.semiring
+    C = []
+    for i in range(len(A)):
+        row = []
+        for j in range(len(B[0])):
+            c = S.zero()
+            for k in range(len(B)):
+                c = S.sum(c, S.mul(A[i][k], B[k][j]))
+            row.append(c)
+        C.append(row)
+    return C
+
+
+def principal_solution(R, A, B):
+    """
+    Returns the principal solution A \\ B of A * X = B if it is a solution, returns None otherwise.
+    Entries not constrained by A are zero, any other values of them give a solution too.
+    """
+    X = left_residual(R, A, B)
+    return X if mul(R, A, X) == [list(row) for row in B] else None
+
+
+def solve_outer_product(R, N, p=None, q=None):
+    """
+    Given a matrix N of size d1 x d2. Returns a column p and a row q such that p * q >= N for min-plus
+    (p * q <= N for max-plus), they are obtained by residuation: p = N / q, q = p \\ N starting from the row q,
+    or q = p \\ N, p = N / q starting from the column p. The unit row is the start by default.
+    """
+    if p is None:
+        q = q or [[R.semiring.one() for j in range(len(N[0]))]]
+        p = right_residual(R, N, q)
+    q = left_residual(R, p, N)
+    p = right_residual(R, N, q)
+    return p, q
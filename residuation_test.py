@@ -0,0 +1,46 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import random
+import unittest
+import residuation
+import tropical_algebra
+from matrix_tools import generate_random_matrix
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def test_residuals(self):
+        random.seed(0)
+        for semiring in [tropical_algebra.R_min_plus(), tropical_algebra.R_max_plus()]:
+            R = tropical_algebra.MatrixSemiring(semiring, 5)
+            for test in range(20):
+                A = generate_random_matrix(R, -100, 100)
+                X = generate_random_matrix(R, -100, 100)
+                B = R.mul(A, X)
+                P = residuation.principal_solution(R, A, B)
+                self.assertIsNotNone(P)
+                self.assertEqual(B, R.mul(A, P))
+                self.assertEqual(B, R.mul(residuation.right_residual(R, B, X), X))
+                # The principal solution is the least solution for min-plus and the greatest one for max-plus.
+                self.assertTrue(all(semiring.sum(p, x) == p for p, x in zip(sum(P, []), sum(X, []))))
+
+        R = tropical_algebra.MatrixSemiring(tropical_algebra.R_min_plus(), 2)
+        self.assertIsNone(residuation.principal_solution(R, [[0, 0], [0, 0]], [[0, 1], [1, 0]]))
+        self.assertEqual([[2, 3], [R.semiring.zero(), R.semiring.zero()]], residuation.left_residual(R, [[0, R.semiring.zero()]], [[2, 3]]))
+        # The unconstrained row is zero, it does not change the product.
+        self.assertEqual([[2, 3], [R.semiring.zero(), R.semiring.zero()]],
+                         residuation.principal_solution(R, [[0, R.semiring.zero()]], [[2, 3]]))
+        self.assertEqual([[2, R.semiring.zero()]], residuation.right_residual(R, [[2]], [[0], [R.semiring.zero()]]))
+
+    def test_solve_outer_product(self):
+        R = tropical_algebra.MatrixSemiring(tropical_algebra.R_min_plus(), 3)
+        N = [[1, 5, 2], [0, 4, 7]]
+        for start in [dict(), dict(q=[N[1]]), dict(p=[[5], [4]])]:
+            p, q = residuation.solve_outer_product(R, N, **start)
+            self.assertTrue(all(p[i][0] + q[0][j] >= N[i][j] for i in range(2) for j in range(3)))
+            self.assertEqual((p, q), residuation.solve_outer_product(R, N, p=p))
+
+
+if __name__ == "__main__":
+    unittest.main()
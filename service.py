@@ -0,0 +1,198 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023
+
+The attack service: it reads requests, one JSON object per line, from stdin or from connections to a Unix socket,
+runs attacks on a pool of warm worker processes, and writes results as they are ready:
+
+    python3 service.py --workers=4
+    python3 service.py --workers=4 --socket=/tmp/tropical3.sock
+
+A request is {"id": ..., "protocol": "hld", "params": {"size": 10, ...}, "instance": {...}, "timeout": 60},
+where params are arguments of tropical3 for the protocol and instance is a transcript as returned by generate_instance.
+If the request has "key", the key found by the attack is checked. The result is
+{"id": ..., "status": "OK", "result": [x, y], "time": seconds}, the status is "OK", "FAIL", "TIMEOUT" or "ERROR".
+
+Workers import solvers once and keep rings and caches of public parameters between requests.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import importlib
+import json
+import math
+import os
+import socketserver
+import sys
+import threading
+import time
+import tropical3
+
+
+def warm_up(protocols):
+    """Imports modules of protocols and solvers in a worker."""
+    importlib.import_module("scipy.optimize")
+    for name in protocols:
+        tropical3.PROTOCOLS[name].load()
+
+
+max_params = 16
+"""The number of attack parameters kept by get_params."""
+
+params_cache = collections.OrderedDict()
+"""Attack parameters by protocols and their arguments, so rings are kept with their caches between requests."""
+
+
+def get_params(protocol, params):
+    """
+    Returns attack parameters for arguments of a protocol, arguments missing in params are None.
+    At most max_params of them are kept, the least recently used ones are evicted with their rings.
+    """
+    key = (protocol, json.dumps(params, sort_keys=True))
+    if key in params_cache:
+        params_cache.move_to_end(key)
+        return params_cache[key]
+
+    P = tropical3.PROTOCOLS[protocol]
+    args = dict.fromkeys(P.arguments() + list(P.attack_options))
+    args.update(params)
+    if len(params_cache) >= max_params:
+        params_cache.popitem(last=False)
+    params_cache[key] = P.make_params(argparse.Namespace(**args))[1]
+    return params_cache[key]
+
+
+def to_json(x):
+    """Returns a result of an attack with NumPy numbers replaced by ints or floats."""
+    if isinstance(x, (list, tuple)):
+        return [to_json(y) for y in x]
+    x = float(x)
+    return int(x) if math.isfinite(x) and x == int(x) else x
+
+
+def handle(request):
+    """Runs the attack of a request. Returns the result."""
+    import attack
+
+    st = time.perf_counter()
+    reply = {"id": request.get("id")}
+    try:
+        module = tropical3.PROTOCOLS[request["protocol"]].load()
+        attack_params = get_params(request["protocol"], request.get("params", {}))
+        instance = request["instance"]
+        result = module.run_attack(attack_params, instance, attack.Deadline(request.get("timeout")))
+        if isinstance(result, attack.TimedOut):
+            reply["status"] = "TIMEOUT"
+        elif not result:
+            reply["status"] = "FAIL"
+        else:
+            ok = "key" not in request or module.check_key(attack_params, instance, attack_params["ring"].freeze(request["key"]), result)
+            reply["status"] = "OK" if ok else "FAIL"
+            reply["result"] = to_json(list(result))
+            if isinstance(result, attack.Solution):
+                reply["strategy"] = result.strategy
+    except Exception as e:
+        reply["status"] = "ERROR"
+        reply["error"] = "{}: {}".format(type(e).__name__, e)
+    reply["time"] = time.perf_counter() - st
+    reply["worker"] = os.getpid()
+    return reply
+
+
+class Service:
+    """The pool of workers, requests are submitted to it and results are passed to callbacks."""
+
+    def __init__(self, workers=1, protocols=()):
+        self.executor = None
+        if workers > 0:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                workers, initializer=warm_up, initargs=(tuple(protocols),))
+        else:
+            warm_up(protocols)
+
+    def submit(self, line, callback):
+        """Submits a request given by a line of JSON, callback(result) is called when the result is ready."""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            callback({"id": None, "status": "ERROR", "error": "ValueError: {}".format(e)})
+            return None
+        if not self.executor:
+            callback(handle(request))
+            return None
+
+        def done(future):
+            try:
+                callback(future.result())
+            except Exception as e:
+                callback({"id": request.get("id"), "status": "ERROR", "error": "{}: {}".format(type(e).__name__, e)})
+
+        future = self.executor.submit(handle, request)
+        future.add_done_callback(done)
+        return future
+
+    def serve_lines(self, lines, output):
+        """Submits requests from lines and writes results to output, returns when all results are written."""
+        lock = threading.Lock()
+
+        def write(result):
+            with lock:
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+
+        futures = [self.submit(line, write) for line in lines if line.strip()]
+        concurrent.futures.wait([f for f in futures if f])
+
+    def serve_socket(self, path):
+        """Serves connections to a Unix socket until it is shut down. Returns the server."""
+        service = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                output = self.wfile
+
+                class Writer:
+                    def write(self, s):
+                        output.write(s.encode())
+
+                    def flush(self):
+                        output.flush()
+
+                service.serve_lines((line.decode() for line in self.rfile), Writer())
+
+        if os.path.exists(path):
+            os.remove(path)
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+
+
+def get_arguments_parser():
+    parser = argparse.ArgumentParser(
+        description="The service to run attacks on transcripts.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        "--workers", help="Number of worker processes, requests are run in this process if it is 0", default=os.cpu_count(), type=int)
+    parser.add_argument(
+        "--socket", help="Path to the Unix socket to listen, requests are read from stdin if it is not set", type=str)
+    parser.add_argument(
+        "--protocols", help="Comma-separated protocols, modules of which are imported by workers at start", default=",".join(tropical3.PROTOCOLS), type=str)
+    return parser
+
+
+if __name__ == "__main__":
+    args = get_arguments_parser().parse_args()
+    service = Service(args.workers, args.protocols.split(","))
+    if args.socket:
+        server = service.serve_socket(args.socket)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        service.serve_lines(sys.stdin, sys.stdout)
+    service.close()
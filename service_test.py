@@ -0,0 +1,80 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import io
+import json
+import os
+import socket
+import tempfile
+import unittest
+import unittest.mock
+import service
+import test_tools
+import tropical3
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def get_requests(self):
+        protocol = tropical3.PROTOCOLS["hld"]
+        args = tropical3.get_arguments_parser().parse_args(
+            ["hld", "--count=1", "--size=5", "--timeout=10", "--min_matrix_elem=-1000", "--max_matrix_elem=1000",
+             "--min_matrix_param=1", "--max_matrix_param=5"])
+        instance_params, attack_params = protocol.make_params(args)
+        instance_params["rng"] = test_tools.get_random_generator(1)
+        params = {"size": 5, "min_matrix_elem": -1000, "max_matrix_elem": 1000}
+        requests = [json.dumps({"id": i, "protocol": "hld", "params": params, "instance": instance,
+                                "key": [list(row) for row in key], "timeout": 30})
+                    for i, (instance, key) in enumerate(protocol.load().generate_instances(instance_params, 3))]
+        requests.append("not a request")
+        requests.append(json.dumps({"id": "unknown", "protocol": "unknown", "instance": {}}))
+        return requests
+
+    def check_results(self, lines):
+        results = {result["id"]: result for result in map(json.loads, lines)}
+        self.assertEqual({0, 1, 2, None, "unknown"}, set(results))
+        for i in range(3):
+            self.assertEqual("OK", results[i]["status"])
+            self.assertEqual(2, len(results[i]["result"]))
+        self.assertEqual("ERROR", results[None]["status"])
+        self.assertEqual("ERROR", results["unknown"]["status"])
+
+    def test_service(self):
+        requests = self.get_requests()
+        for workers in [0, 2]:
+            s = service.Service(workers, ["hld"])
+            output = io.StringIO()
+            s.serve_lines(requests, output)
+            s.close()
+            self.check_results(output.getvalue().splitlines())
+
+        s = service.Service(1, ["hld"])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "service.sock")
+            server = s.serve_socket(path)
+            with socket.socket(socket.AF_UNIX) as sock:
+                sock.connect(path)
+                f = sock.makefile("rw")
+                for request in requests:
+                    f.write(request + "\n")
+                f.flush()
+                self.check_results([f.readline() for request in requests])
+            server.shutdown()
+        s.close()
+
+    def test_params_cache(self):
+        service.params_cache.clear()
+        with unittest.mock.patch.object(service, "max_params", 2):
+            params = [{"size": n, "min_matrix_elem": 0, "max_matrix_elem": 10} for n in [3, 4, 5]]
+            R = service.get_params("hld", params[0])["ring"]
+            service.get_params("hld", params[1])
+            # The parameters of size 3 are used again, so those of size 4 are evicted.
+            self.assertIs(R, service.get_params("hld", params[0])["ring"])
+            service.get_params("hld", params[2])
+            self.assertEqual(2, len(service.params_cache))
+            self.assertIs(R, service.get_params("hld", params[0])["ring"])
+        service.params_cache.clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
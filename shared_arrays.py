@@ -0,0 +1,83 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023
+
+Read-only NumPy arrays in shared memory. A process publishes an array once and sends its small reference to workers,
+which attach the array by name without copying it, so the cost of a task does not depend on the size of the array.
+"""
+
+import numpy
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+
+class SharedArrayRef:
+    """The name, shape and dtype of a published array, it is sent to workers instead of the array."""
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    def __repr__(self):
+        return "SharedArrayRef({}, {}, {})".format(self.name, self.shape, self.dtype)
+
+
+class SharedArrays:
+    """Arrays published by this process, they are removed from shared memory by close()."""
+
+    def __init__(self):
+        self.segments = []
+
+    def publish(self, A):
+        """Copies an array (e.g., a stack of matrices) to shared memory. Returns its reference."""
+        A = numpy.ascontiguousarray(A)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, A.nbytes))
+        numpy.ndarray(A.shape, dtype=A.dtype, buffer=shm.buf)[...] = A
+        self.segments.append(shm)
+        published.add(shm.name)
+        return SharedArrayRef(shm.name, A.shape, A.dtype.str)
+
+    def close(self):
+        for shm in self.segments:
+            published.discard(shm.name)
+            shm.close()
+            shm.unlink()
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+published = set()
+"""Names of segments published by this process, forked workers inherit it."""
+
+attached = dict()
+"""Segments attached by this process by their names."""
+
+
+def attach(ref):
+    """Returns the read-only array published with the reference, it shares memory with the publisher."""
+    if ref.name not in attached:
+        try:
+            shm = shared_memory.SharedMemory(name=ref.name, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=ref.name)
+            # The publisher owns the segment, so the resource tracker of a process, which does not share it
+            # with the publisher, must not remove the segment when the process exits.
+            if ref.name not in published:
+                resource_tracker.unregister(shm._name, "shared_memory")
+        attached[ref.name] = shm
+    A = numpy.ndarray(ref.shape, dtype=numpy.dtype(ref.dtype),
+                      buffer=attached[ref.name].buf)
+    A.flags.writeable = False
+    return A
+
+
+def detach(ref):
+    """Closes the segment of the reference attached by this process, arrays returned by attach must not be used after it."""
+    shm = attached.pop(ref.name, None)
+    if shm:
+        shm.close()
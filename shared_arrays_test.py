@@ -0,0 +1,36 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import multiprocess
+import numpy
+import pickle
+import unittest
+import shared_arrays
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def test_shared_arrays(self):
+        small = numpy.arange(12).reshape(3, 4)
+        large = numpy.arange(10**6, dtype=numpy.float64).reshape(10, 100, 1000)
+        with shared_arrays.SharedArrays() as arrays:
+            refs = [arrays.publish(small), arrays.publish(large)]
+            self.assertLess(abs(len(pickle.dumps(refs[0])) - len(pickle.dumps(refs[1]))), 16)
+
+            A = shared_arrays.attach(refs[0])
+            self.assertEqual(small.tolist(), A.tolist())
+            self.assertFalse(A.flags.writeable)
+
+            q = multiprocess.Queue()
+            p = multiprocess.Process(target=lambda: q.put(
+                [float(shared_arrays.attach(ref).sum()) for ref in refs]))
+            p.start()
+            self.assertEqual([float(small.sum()), float(large.sum())], q.get())
+            p.join()
+            for ref in refs:
+                shared_arrays.detach(ref)
+        self.assertEqual([], arrays.segments)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,52 +2,133 @@
 (c) I. Buchinskiy, M. Kotov, A. Treier, 2023
 """
 
+import collections
+import os
 import time
-import multiprocess
 import random
+import attack
 
 
-def perform_one_experiment(instance_params, attack_params, generate_instance, run_attack, check_key):
-    """Runs one experiment: generates an instance, runs an attack, and check the obtained key."""
+def perform_one_experiment(instance_params, attack_params, generate_instance, run_attack, check_key, deadline=None):
+    """
+    Runs one experiment: generates an instance, runs an attack, and check the obtained key.
+    If the attack is stopped by the deadline, returns its attack.TimedOut result.
+    If strategies raced, returns TestResult with the name of the strategy, which found the key.
+    """
 
     instance, key = generate_instance(instance_params)
     if not instance or not key:
         return False
 
-    result = run_attack(attack_params, instance)
+    result = run_attack(attack_params, instance, deadline)
+    if isinstance(result, attack.TimedOut):
+        return result
     if not result:
         return False
+    ok = check_key(attack_params, instance, key, result)
+    if isinstance(result, attack.Solution):
+        return TestResult("OK" if ok else "FAIL", result.strategy)
+    return ok
 
-    return check_key(attack_params, instance, key, result)
 
+class TestResult(str):
+    """The result of an experiment, "OK", "FAIL" or "TIMEOUT", with the name of the strategy, which found the key."""
 
-def test_suite(perform_one_experiment, instance_params, attack_params, number_of_tests, timeout):
-    """Runs a set of tests."""
+    def __new__(cls, result, strategy=None):
+        self = super().__new__(cls, result)
+        self.strategy = strategy
+        return self
+
+    def __bool__(self):
+        return self == "OK"
+
+
+def get_random_generator(seed, entropy=0):
+    """
+    Returns the numpy.random.Generator of the experiment with a seed.
+    It is the seed-th child of SeedSequence(entropy) as given by SeedSequence.spawn,
+    so generators of experiments are reproducible and independent wherever the experiments are run.
+    """
+    import numpy
+
+    return numpy.random.default_rng(numpy.random.SeedSequence(entropy, spawn_key=(seed,)))
+
+
+def get_instance_params_for_seed(instance_params, seed):
+    """Returns instance parameters with the random generator of the experiment with a seed."""
+    params = dict(instance_params)
+    params["rng"] = get_random_generator(seed)
+    return params
+
+
+def get_attack_params_for_seed(attack_params, seed):
+    """If checkpoint_dir is given, returns attack parameters with the path to the checkpoint of the experiment with a seed."""
+    if not attack_params.get("checkpoint_dir"):
+        return attack_params
+    os.makedirs(attack_params["checkpoint_dir"], exist_ok=True)
+    params = dict(attack_params)
+    params["checkpoint"] = os.path.join(
+        attack_params["checkpoint_dir"], "seed_{}.pkl".format(seed))
+    return params
+
+
+def get_test_result(result):
+    """Returns "OK", "FAIL" or "TIMEOUT" by the result of an experiment."""
+    if isinstance(result, TestResult):
+        return result
+    if isinstance(result, attack.TimedOut):
+        return "TIMEOUT"
+    return "OK" if result else "FAIL"
+
+
+def run_one_test(perform_one_experiment, instance_params, attack_params, seed, timeout, kill_delay=1):
+    """
+    Runs one experiment with a seed in a separate process. Returns "OK", "FAIL" or "TIMEOUT".
+    The attack is stopped by the deadline, the process is killed if it is still alive kill_delay seconds later.
+    """
+    import multiprocess
+
+    attack_params = get_attack_params_for_seed(attack_params, seed)
+    q = multiprocess.Queue()
+    p = multiprocess.Process(target=lambda q: [random.seed(seed), q.put(perform_one_experiment(
+        get_instance_params_for_seed(instance_params, seed), attack_params, attack.Deadline(timeout)))], args=(q,))
+    p.start()
+    p.join(timeout + kill_delay)
+    if p.is_alive():
+        p.terminate()
+        p.join()
+        return "TIMEOUT"
+    return get_test_result(q.get())
+
+
+def run_one_test_in_process(perform_one_experiment, instance_params, attack_params, seed, timeout):
+    """Runs one experiment with a seed in this process, the attack is stopped by a deadline. Returns "OK", "FAIL" or "TIMEOUT"."""
+    random.seed(seed)
+    return get_test_result(perform_one_experiment(get_instance_params_for_seed(instance_params, seed),
+                                                  get_attack_params_for_seed(attack_params, seed), attack.Deadline(timeout)))
+
+
+def print_summary(results, diff_time):
+    """Prints the summary of a set of tests by their results and, if strategies raced, the numbers of keys found by them."""
+    print("Total time: ", diff_time)
+    print("Average time: ", diff_time / len(results))
+    print("OK: ", results.count("OK"))
+    print("FAIL: ", results.count("FAIL"))
+    print("FAIL (BY TIMEOUT): ", results.count("TIMEOUT"))
+    strategies = collections.Counter(
+        r.strategy for r in results if r == "OK" and getattr(r, "strategy", None))
+    for name, count in sorted(strategies.items()):
+        print("OK (BY THE STRATEGY {}): ".format(name), count)
+
+
+def test_suite(perform_one_experiment, instance_params, attack_params, number_of_tests, timeout, in_process=False):
+    """Runs a set of tests, each in a separate process or, if in_process is set, in this process."""
+    run = run_one_test_in_process if in_process else run_one_test
     st = time.time()
-    ok = 0
-    fl = 0
-    fl_by_timeout = 0
+    results = []
     for i in range(1, number_of_tests + 1):
-        q = multiprocess.Queue()
-        p = multiprocess.Process(target=lambda q: [random.seed(i), q.put(
-            perform_one_experiment(instance_params, attack_params))], args=(q,))
-        p.start()
-        p.join(timeout)
-        if p.is_alive():
-            print("TIMEOUT")
-            p.terminate()
-            p.join()
-            fl_by_timeout += 1
-        elif q.get():
-            print("OK")
-            ok += 1
-        else:
-            print("FAIL")
-            fl += 1
+        results.append(run(perform_one_experiment,
+                       instance_params, attack_params, i, timeout))
+        print(results[-1])
     et = time.time()
-    diff_time = et - st
-    print("Total time: ", diff_time)
-    print("Average time: ", diff_time / number_of_tests)
-    print("OK: ", ok)
-    print("FAIL: ", fl)
-    print("FAIL (BY TIMEOUT): ", fl_by_timeout)
+    print_summary(results, et - st)
@@ -0,0 +1,199 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023
+
+The entry point to check the attacks on all protocols:
+
+    python3 -m tropical3 <protocol> --count=10 --timeout=60 --size=10 ...
+
+Modules of the attacks are imported only when the corresponding protocol is run,
+so that the parser and --help do not import scipy or multiprocess.
+"""
+
+import argparse
+import importlib
+import sys
+
+
+ARGUMENTS = {
+    "count": "Number of tests",
+    "size": "Size of matrices",
+    "timeout": "Timeout for each experiment",
+    "min_matrix_elem": "Lower bound to generate elements of matrices",
+    "max_matrix_elem": "Upper bound to generate elements of matrices",
+    "min_poly_deg": "Lower bound to generate polynomial degrees",
+    "max_poly_deg": "Upper bound to generate polynomial degrees",
+    "min_poly_coef": "Lower bound to generate polynomial coefficients",
+    "max_poly_coef": "Upper bound to generate polynomial coefficients",
+    "poly_deg_bound": "Upper bound for polynomial degrees, this is a parameter of the attack",
+    "min_matrix_param": "Lower bound to generate s and t",
+    "max_matrix_param": "Upper bound to generate s and t",
+    "min_matrix_step": "Lower bound to generate p",
+    "max_matrix_step": "Upper bound to generate p",
+}
+"""Help strings of all integer arguments of the scripts."""
+
+OPTIONS = {
+    "power_cache_dir": "Directory to keep powers of matrices in memory-mapped files, they are kept in memory if it is not set",
+    "checkpoint_dir": "Directory to save states of attacks stopped by the timeout, the next run with it resumes them",
+    "portfolio": "Comma-separated strategies to race in parallel processes: default, sum, greedy, wide, random_<seed>",
+    "search": "Method to search a solution by the grid of minima: covers or milp, which solves one mixed-integer program",
+    "feasibility": "Backend to solve linear programs: linprog or graph, it is chosen by TROPICAL3_FEASIBILITY or the tuner if it is not set",
+}
+"""Help strings of all optional string arguments of the scripts."""
+
+COMMON_ARGUMENTS = ["count", "size", "timeout"]
+"""Arguments of the test suite, they are used by all protocols."""
+
+
+class Protocol:
+    """A protocol: the module with generate_instance, run_attack, check_key and the names of its parameters."""
+
+    def __init__(self, module, instance_params, attack_params, attack_options=()):
+        self.module = module
+        self.instance_params = instance_params
+        self.attack_params = attack_params
+        self.attack_options = attack_options
+
+    def arguments(self):
+        """Returns the names of arguments of the protocol in the order of their first appearance."""
+        return list(dict.fromkeys(COMMON_ARGUMENTS + self.instance_params + self.attack_params))
+
+    def load(self):
+        """Imports the module of the protocol."""
+        return importlib.import_module(self.module)
+
+    def make_params(self, args):
+        """Returns instance and attack parameters built from parsed arguments."""
+        import tropical_algebra
+
+        tuner = None
+        if getattr(args, "autotune", False):
+            import autotune
+
+            tuner = autotune.get_tuner()
+        R = tropical_algebra.MatrixSemiring(
+            tropical_algebra.R_min_plus(), args.size, threads=getattr(args, "threads", 1), tuner=tuner)
+        instance_params = {"ring": R}
+        instance_params.update(
+            (name, getattr(args, name)) for name in self.instance_params)
+        attack_params = {"ring": R}
+        attack_params.update(
+            (name, getattr(args, name)) for name in self.attack_params)
+        attack_params.update((name, getattr(args, name))
+                             for name in self.attack_options if getattr(args, name) is not None)
+        if getattr(args, "no_presolve", False):
+            attack_params["presolve"] = False
+        return instance_params, attack_params
+
+
+PROTOCOLS = {
+    "gs": Protocol(
+        "attack_on_gs",
+        ["min_matrix_elem", "max_matrix_elem", "min_poly_deg",
+            "max_poly_deg", "min_poly_coef", "max_poly_coef"],
+        ["max_poly_deg", "min_poly_coef", "max_poly_coef"],
+        ["power_cache_dir", "checkpoint_dir", "portfolio", "search", "feasibility"]),
+    "d": Protocol(
+        "attack_on_d",
+        ["min_matrix_elem", "max_matrix_elem", "min_poly_deg",
+            "max_poly_deg", "min_poly_coef", "max_poly_coef"],
+        ["poly_deg_bound"],
+        ["power_cache_dir", "checkpoint_dir", "portfolio", "search", "feasibility"]),
+    "hld": Protocol(
+        "attack_on_hld",
+        ["min_matrix_elem", "max_matrix_elem",
+            "min_matrix_param", "max_matrix_param"],
+        ["min_matrix_elem", "max_matrix_elem"],
+        ["checkpoint_dir", "portfolio", "search", "feasibility"]),
+    "ap_1": Protocol(
+        "attack_on_ap_1",
+        ["min_matrix_elem", "max_matrix_elem",
+            "min_matrix_param", "max_matrix_param"],
+        ["min_matrix_elem", "max_matrix_elem"],
+        ["checkpoint_dir", "portfolio", "search", "feasibility"]),
+    "ap_2": Protocol(
+        "attack_on_ap_2",
+        ["min_matrix_elem", "max_matrix_elem", "min_matrix_param",
+            "max_matrix_param", "min_matrix_step", "max_matrix_step"],
+        ["min_matrix_elem", "max_matrix_elem"],
+        ["checkpoint_dir", "portfolio", "search", "feasibility"]),
+}
+"""The registry of protocols."""
+
+
+def add_protocol_arguments(parser, protocol):
+    """Adds arguments of a protocol to a parser."""
+    for name in PROTOCOLS[protocol].arguments():
+        parser.add_argument(
+            "--" + name,
+            help=ARGUMENTS[name],
+            required=True,
+            type=int
+        )
+    parser.add_argument(
+        "--threads",
+        help="Number of threads to multiply large matrices",
+        default=1,
+        type=int
+    )
+    parser.add_argument(
+        "--autotune",
+        help="Choose backends of products and linear programs by the tuning profile, backends are timed on the first use",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--no_presolve",
+        help="Do not try principal solutions obtained by residuation before the search of covers",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--in_process",
+        help="Run experiments in this process stopping attacks by the timeout instead of running a process per experiment",
+        action="store_true"
+    )
+    for name in PROTOCOLS[protocol].attack_options:
+        parser.add_argument(
+            "--" + name,
+            help=OPTIONS[name],
+            type=str
+        )
+
+
+def get_arguments_parser(protocol=None):
+    """Returns the parser for all protocols or, if protocol is given, for this protocol only."""
+    if protocol:
+        parser = argparse.ArgumentParser(
+            description="The script to check the attack.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+        add_protocol_arguments(parser, protocol)
+        return parser
+
+    parser = argparse.ArgumentParser(
+        prog="tropical3",
+        description="The script to check the attacks.", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    subparsers = parser.add_subparsers(
+        dest="protocol", metavar="protocol", required=True)
+    for name, protocol in PROTOCOLS.items():
+        subparser = subparsers.add_parser(
+            name, help="The attack from " + protocol.module + ".py",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+        add_protocol_arguments(subparser, name)
+    return parser
+
+
+def run(protocol, args):
+    """Runs the test suite for a protocol with parsed arguments."""
+    import test_tools
+
+    module = PROTOCOLS[protocol].load()
+    instance_params, attack_params = PROTOCOLS[protocol].make_params(args)
+    test_tools.test_suite(module.perform_one_experiment,
+                          instance_params, attack_params, args.count, args.timeout, getattr(args, "in_process", False))
+
+
+def main(argv=None):
+    args = get_arguments_parser().parse_args(argv)
+    run(args.protocol, args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,56 @@
+"""
+(c) I. Buchinskiy, M. Kotov, A. Treier, 2023.
+"""
+
+import subprocess
+import sys
+import unittest
+import tropical3
+
+
+class TestTropicalAlgebra(unittest.TestCase):
+    def test_parser(self):
+        args = tropical3.get_arguments_parser().parse_args(
+            ["hld", "--count=1", "--size=3", "--timeout=10", "--min_matrix_elem=0", "--max_matrix_elem=10",
+             "--min_matrix_param=-10", "--max_matrix_param=10"])
+        instance_params, attack_params = tropical3.PROTOCOLS[args.protocol].make_params(
+            args)
+
+        self.assertEqual(3, instance_params["ring"].size())
+        self.assertEqual(-10, instance_params["min_matrix_param"])
+        self.assertEqual(
+            {"ring", "min_matrix_elem", "max_matrix_elem"}, set(attack_params))
+
+    def test_protocols_are_loadable(self):
+        for protocol in tropical3.PROTOCOLS.values():
+            module = protocol.load()
+            self.assertTrue(hasattr(module, "perform_one_experiment"))
+
+    def test_generate_instances(self):
+        for name, protocol in tropical3.PROTOCOLS.items():
+            module = protocol.load()
+            args = tropical3.get_arguments_parser().parse_args(
+                [name] + ["--{}=1".format(arg) for arg in protocol.arguments()])
+            args.size = 5
+            args.min_matrix_elem = -100
+            args.max_matrix_elem = 100
+            args.max_poly_deg = 5
+            args.poly_deg_bound = 20
+            instance_params, attack_params = protocol.make_params(args)
+            instances = module.generate_instances(instance_params, 50)
+
+            self.assertEqual(50, len(instances))
+            instance, key = instances[0]
+            result = module.run_attack(attack_params, instance)
+            self.assertTrue(module.check_key(
+                attack_params, instance, key, result))
+
+    def test_lazy_imports(self):
+        code = "import sys, tropical3, attack_on_gs; tropical3.get_arguments_parser(); print('scipy' in sys.modules or 'multiprocess' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", code],
+                             capture_output=True, text=True, check=True)
+        self.assertEqual("False", out.stdout.strip())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,12 @@
 """
 
 from abc import ABC, abstractmethod
+import collections
+import os
+import random
+import warnings
+import autotune
+import public_cache
 
 INFTY = float('inf')
 """This constant represent +infinity."""
@@ -14,6 +20,12 @@ MINFTY = float('-inf')
 class Semiring(ABC):
     """Semiring."""
 
+    ufuncs = None
+    """
+    NumPy ufuncs (or their names in numpy) for sum and mul of the semiring, e.g., ("minimum", "add").
+    If they are declared, then MatrixSemiring uses vectorized kernels generated from them.
+    """
+
     @abstractmethod
     def zero(self):
         """Returns the zero element of the semiring."""
@@ -34,8 +46,23 @@ class Semiring(ABC):
         """Returns the product of two elements of the semiring."""
         pass
 
+    def div(self, a, b):
+        """Returns c such that a = b * c. Semirings without division do not override it."""
+        raise NotImplementedError
+
+    def pwr(self, a, m):
+        """Returns an element of the semiring raised to the power m."""
+        if m == 0:
+            return self.one()
+        if m % 2 == 0:
+            return self.pwr(self.mul(a, a), m // 2)
+        else:
+            return self.mul(a, self.pwr(a, m - 1))
+
 
 class R_min_plus(Semiring):
+    ufuncs = ("minimum", "add")
+
     def zero(self):
         return INFTY
 
@@ -48,8 +75,16 @@ class R_min_plus(Semiring):
     def mul(self, a, b):
         return a + b
 
+    def div(self, a, b):
+        return a - b
+
+    def pwr(self, a, m):
+        return a * m if m != 0 else 0
+
 
 class R_max_plus(Semiring):
+    ufuncs = ("maximum", "add")
+
     def zero(self):
         return MINFTY
 
@@ -62,11 +97,256 @@ class R_max_plus(Semiring):
     def mul(self, a, b):
         return a + b
 
+    def div(self, a, b):
+        return a - b
+
+    def pwr(self, a, m):
+        return a * m if m != 0 else 0
+
+
+class R_max_min(Semiring):
+    ufuncs = ("maximum", "minimum")
+
+    def zero(self):
+        return MINFTY
+
+    def one(self):
+        return INFTY
+
+    def sum(self, a, b):
+        return max(a, b)
+
+    def mul(self, a, b):
+        return min(a, b)
+
+
+class R_min_max(Semiring):
+    ufuncs = ("minimum", "maximum")
+
+    def zero(self):
+        return INFTY
+
+    def one(self):
+        return MINFTY
+
+    def sum(self, a, b):
+        return min(a, b)
+
+    def mul(self, a, b):
+        return max(a, b)
+
+
+class R_max_times(Semiring):
+    """Non-negative reals with max and multiplication."""
+
+    ufuncs = ("maximum", "multiply")
+
+    def zero(self):
+        return 0
+
+    def one(self):
+        return 1
+
+    def sum(self, a, b):
+        return max(a, b)
+
+    def mul(self, a, b):
+        return a * b
+
+    def div(self, a, b):
+        return a / b
+
+
+class Matrix(tuple):
+    """
+    An immutable matrix, i.e., a tuple of rows. Its hash is computed once,
+    so matrices can be compared fast and used as keys of dictionaries.
+    A matrix is equal to a list of lists with the same elements.
+    """
+
+    max_interned = 4096
+    """The number of interned matrices, the least recently used ones are evicted."""
+
+    interned = collections.OrderedDict()
+
+    def __new__(cls, A):
+        if isinstance(A, Matrix):
+            return A
+        M = super().__new__(cls, (tuple(row) for row in A))
+        M._hash = tuple.__hash__(M)
+        M._normalized = dict()
+        return M
+
+    @classmethod
+    def intern(cls, A):
+        """Returns the matrix equal to A, the same object for equal matrices."""
+        M = cls(A)
+        N = cls.interned.get(M)
+        if N is not None:
+            cls.interned.move_to_end(N)
+            return N
+        if len(cls.interned) >= cls.max_interned:
+            cls.interned.popitem(last=False)
+        cls.interned[M] = M
+        return M
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, Matrix):
+            return self._hash == other._hash and tuple.__eq__(self, other)
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(a == tuple(b) for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __repr__(self):
+        return "Matrix(" + repr(self.tolist()) + ")"
+
+    def tolist(self):
+        """Returns the matrix as a list of lists."""
+        return [list(row) for row in self]
+
+    def normalize(self, semiring):
+        """Returns c and the matrix N such that this matrix is c * N, c is the minimal non-zero element of it."""
+        key = type(semiring)
+        if key not in self._normalized:
+            zero = semiring.zero()
+            finite = [x for row in self for x in row if x != zero]
+            if not finite:
+                self._normalized[key] = semiring.one(), self
+            else:
+                c = min(finite)
+                self._normalized[key] = c, Matrix(
+                    [[x if x == zero else semiring.div(x, c) for x in row] for row in self])
+        return self._normalized[key]
+
+    def normalized_hash(self, semiring):
+        """Returns the hash of the matrix up to a const."""
+        return hash(self.normalize(semiring)[1])
+
+
+class SparseMatrix:
+    """
+    A sparse matrix of size n x n in the CSR format: elements of the i-th row are values[indptr[i]:indptr[i + 1]],
+    their columns are indices[indptr[i]:indptr[i + 1]]. Absent elements are the zero of a semiring.
+    """
+
+    def __init__(self, n, indptr, indices, values):
+        self.n = n
+        self.indptr = indptr
+        self.indices = indices
+        self.values = values
+
+    @classmethod
+    def from_dense(cls, A, zero):
+        """Returns the sparse form of a matrix A."""
+        indptr = [0]
+        indices = []
+        values = []
+        for row in A:
+            for j, x in enumerate(row):
+                if x != zero:
+                    indices.append(j)
+                    values.append(x)
+            indptr.append(len(indices))
+        return cls(len(A), indptr, indices, values)
+
+    def nnz(self):
+        """Returns the number of stored elements."""
+        return len(self.values)
+
+    def row(self, i):
+        """Returns pairs (j, a_ij) of the stored elements of the i-th row."""
+        return zip(self.indices[self.indptr[i]:self.indptr[i + 1]], self.values[self.indptr[i]:self.indptr[i + 1]])
+
+    def transpose(self):
+        """Returns the transposed matrix."""
+        rows = [[] for _ in range(self.n)]
+        for i in range(self.n):
+            for j, x in self.row(i):
+                rows[j].append((i, x))
+        indptr = [0]
+        for row in rows:
+            indptr.append(indptr[-1] + len(row))
+        return SparseMatrix(self.n, indptr, [i for row in rows for i, _ in row], [x for row in rows for _, x in row])
+
+    def todense(self, zero):
+        """Returns the matrix as a list of lists."""
+        A = [[zero] * self.n for _ in range(self.n)]
+        for i in range(self.n):
+            for j, x in self.row(i):
+                A[i][j] = x
+        return A
+
+
+class Periodicity:
+    """
+    Powers of a matrix A are eventually periodic: A^(k + cyclicity) = shift * A^k for k >= transient.
+    The ladder keeps A^0, ..., A^(transient + cyclicity - 1).
+    """
+
+    def __init__(self, transient, cyclicity, shift, ladder):
+        self.transient = transient
+        self.cyclicity = cyclicity
+        self.shift = shift
+        self.ladder = ladder
+
+    def cycle_mean(self):
+        """Returns the cycle mean (the eigenvalue) of A, it is meaningful when multiplication is addition."""
+        return self.shift / self.cyclicity
+
+    def reduce(self, m):
+        """Returns k and q such that A^m = shift^q * A^k, k < len(ladder)."""
+        if m < len(self.ladder):
+            return m, 0
+        q, r = divmod(m - self.transient, self.cyclicity)
+        return self.transient + r, q
+
 
 class MatrixSemiring:
-    def __init__(self, semiring, n):
+    max_periodicity_bytes = 64 * 2**20
+    """The approximate size in bytes of ladders of matrices, periodicities of which are kept, the least recently used are evicted."""
+
+    sparse_density = 0.3
+    """Matrices with the smaller share of non-zero elements are multiplied in the sparse form."""
+
+    def __init__(self, semiring, n, intern=False, vectorized=True, working_set=None, threads=1, tuner=None):
         self.semiring = semiring
         self.n = n
+        self.intern = intern
+        self.vectorized = vectorized
+        self.working_set = working_set
+        self.threads = threads
+        self.tuner = tuner
+        self.periodicities = public_cache.PublicCache(self.max_periodicity_bytes)
+        self._kernels = None
+        self._mul_backends = None
+
+    def __getstate__(self):
+        # The table of backends has closures, it is built again after unpickling.
+        state = dict(self.__dict__)
+        state["_mul_backends"] = None
+        return state
+
+    def kernels(self):
+        """
+        Returns vectorized kernels generated from NumPy ufuncs of the semiring or None if there are no ufuncs.
+        Products with temporaries larger than working_set elements are computed by tiles,
+        large products are split between threads.
+        """
+        if self._kernels is None and self.vectorized and self.semiring.ufuncs:
+            import kernels
+
+            self._kernels = kernels.UfuncKernels(
+                self.semiring, self.working_set, self.threads)
+        return self._kernels
 
     def size(self):
         """Returns the size of matrices."""
@@ -82,9 +362,228 @@ class MatrixSemiring:
 
     def sum(self, A, B):
         """Returns the sum of two matrices over a semiring."""
+        K = self.kernels()
+        if K:
+            return K.tolist(K.sum(K.array(A), K.array(B)))
         return [[self.semiring.sum(A[i][j], B[i][j]) for j in range(self.n)] for i in range(self.n)]
 
-    def mul(self, A, B):
+    def is_sparse(self, A):
+        """Returns True if A is sparse enough to be multiplied in the sparse form, the sparse form is not built."""
+        if isinstance(A, SparseMatrix):
+            return True
+        zero = self.semiring.zero()
+        if hasattr(A, "dtype"):
+            # NumPy arrays, e.g., memory-mapped powers, are counted without boxing their elements.
+            nnz = int((A != zero).sum())
+        else:
+            nnz = sum(1 for row in A for x in row if x != zero)
+        return nnz <= self.sparse_density * self.n * self.n
+
+    def sparse(self, A):
+        """Returns the sparse form of A if A is sparse enough, returns None otherwise."""
+        if isinstance(A, SparseMatrix):
+            return A
+        if not self.is_sparse(A):
+            return None
+        return SparseMatrix.from_dense(A, self.semiring.zero())
+
+    def mul(self, A, B, backend=None):
+        """
+        Returns the product of two matrices over a semiring, they may be lists of lists, immutable matrices or NumPy arrays.
+        Sparse matrices (e.g., basis and unit matrices) are multiplied in O(nnz * n).
+        The backend is given by the argument, by TROPICAL3_MUL_BACKEND or by the tuner, see get_mul_backend.
+        """
+        backend = self.get_mul_backend(A, B, backend)
+        if backend != "auto":
+            backends = self.mul_backends()
+            if backend not in backends:
+                raise ValueError("Unknown backend of mul: " + backend)
+            return backends[backend](A, B)
+
+        SA = self.sparse(A)
+        SB = self.sparse(B)
+        K = self.kernels()
+        if K:
+            if SA:
+                return K.tolist(K.mul_sparse_dense(SA, K.array(B)))
+            if SB:
+                return K.tolist(K.mul_dense_sparse(K.array(A), SB))
+            return K.tolist(K.mul(K.array(A), K.array(B)))
+        if SA and SB:
+            return self.mul_sparse_sparse(SA, SB)
+        if SA:
+            return self.mul_sparse_dense(SA, B)
+        if SB:
+            return self.mul_dense_sparse(A, SB)
+        return self.mul_dense(A, B)
+
+    def get_mul_backend(self, A, B, backend=None):
+        """
+        Returns the name of the backend to multiply A and B: the given one, the one set by TROPICAL3_MUL_BACKEND,
+        the fastest one for matrices of this size and density by the tuner, or "auto" for the built-in choice.
+        The backend set by TROPICAL3_MUL_BACKEND is ignored with a warning if this matrix semiring does not offer it.
+        """
+        if not backend:
+            backend = os.environ.get(autotune.MUL_BACKEND_ENV)
+            if backend and backend not in self.mul_backends():
+                warnings.warn("{} of mul is not offered by this matrix semiring, it is ignored: {}".format(
+                    autotune.MUL_BACKEND_ENV, backend))
+                backend = None
+        if not backend and self.tuner:
+            density = "sparse" if self.is_sparse(A) or self.is_sparse(B) else "dense"
+            key = "{}/{}/{}".format(type(self.semiring).__name__,
+                                    density, self.threads)
+            backend = self.tuner.get(
+                "mul", key, self.n, lambda sizes: self.tune_mul(sizes, density))
+        return backend or "auto"
+
+    def mul_backends(self):
+        """
+        Returns functions to multiply matrices by names of backends: "loop", "sparse", "pruned" for min-plus and max-plus,
+        and, if there are vectorized kernels, "broadcast", "tiled" and, if threads > 1, "threaded".
+        The table is built once for the matrix semiring.
+        """
+        if self._mul_backends is not None:
+            return self._mul_backends
+        zero = self.semiring.zero()
+
+        def dense(A):
+            return A.todense(zero) if isinstance(A, SparseMatrix) else A
+
+        backends = {
+            "loop": lambda A, B: self.mul_dense(dense(A), dense(B)),
+            "sparse": self.mul_sparse,
+        }
+        if isinstance(self.semiring, (R_min_plus, R_max_plus)):
+            backends["pruned"] = lambda A, B: self.mul_pruned(dense(A), dense(B))
+        K = self.kernels()
+        if K:
+            backends["broadcast"] = lambda A, B: K.tolist(
+                K.mul_broadcast(K.array(A), K.array(B)))
+            backends["tiled"] = lambda A, B: K.tolist(
+                K.mul_tiled(K.array(A), K.array(B)))
+            if self.threads > 1:
+                backends["threaded"] = lambda A, B: K.tolist(
+                    K.mul_threaded(K.array(A), K.array(B)))
+        self._mul_backends = backends
+        return backends
+
+    def tune_mul(self, sizes, density):
+        """
+        Times backends of mul for matrices of given sizes, the first matrix is a permutation matrix if density is "sparse".
+        Returns the fastest backend by every size.
+        """
+        def make_args(n):
+            R = MatrixSemiring(self.semiring, n, vectorized=self.vectorized,
+                               working_set=self.working_set, threads=self.threads)
+            zero = self.semiring.zero()
+            if density == "sparse":
+                p = random.sample(range(n), n)
+                A = [[random.randint(-100, 100) if j == p[i] else zero for j in range(n)]
+                     for i in range(n)]
+            else:
+                A = [[random.randint(-100, 100) for j in range(n)]
+                     for i in range(n)]
+            B = [[random.randint(-100, 100) for j in range(n)]
+                 for i in range(n)]
+            return R, A, B
+
+        return autotune.fastest({name: (lambda name: lambda R, A, B: R.mul(A, B, name))(name) for name in self.mul_backends()},
+                                make_args, sizes)
+
+    def mul_sparse(self, A, B):
+        """Returns the product of two matrices computed by the sparse form of A."""
+        SA = A if isinstance(A, SparseMatrix) else SparseMatrix.from_dense(
+            A, self.semiring.zero())
+        if isinstance(B, SparseMatrix):
+            B = B.todense(self.semiring.zero())
+        K = self.kernels()
+        if K:
+            return K.tolist(K.mul_sparse_dense(SA, K.array(B)))
+        return self.mul_sparse_dense(SA, B)
+
+    def mul_sparse_dense(self, A, B):
+        """Returns the product of a sparse matrix A and a matrix B."""
+        zero = self.semiring.zero()
+        add = self.semiring.sum
+        mul = self.semiring.mul
+        C = []
+        for i in range(self.n):
+            Ci = [zero] * self.n
+            for k, a in A.row(i):
+                Ci = [add(c, mul(a, b)) for c, b in zip(Ci, B[k])]
+            C.append(Ci)
+        return C
+
+    def mul_dense_sparse(self, A, B):
+        """Returns the product of a matrix A and a sparse matrix B."""
+        zero = self.semiring.zero()
+        add = self.semiring.sum
+        mul = self.semiring.mul
+        rows = [list(B.row(k)) for k in range(self.n)]
+        C = []
+        for i in range(self.n):
+            Ci = [zero] * self.n
+            for k, a in enumerate(A[i]):
+                if a == zero:
+                    continue
+                for j, b in rows[k]:
+                    Ci[j] = add(Ci[j], mul(a, b))
+            C.append(Ci)
+        return C
+
+    def mul_sparse_sparse(self, A, B):
+        """Returns the product of two sparse matrices as a list of lists."""
+        zero = self.semiring.zero()
+        add = self.semiring.sum
+        mul = self.semiring.mul
+        rows = [list(B.row(k)) for k in range(self.n)]
+        C = []
+        for i in range(self.n):
+            Ci = [zero] * self.n
+            for k, a in A.row(i):
+                for j, b in rows[k]:
+                    Ci[j] = add(Ci[j], mul(a, b))
+            C.append(Ci)
+        return C
+
+    def mul_pruned(self, A, B):
+        """
+        Returns the exact product of two matrices over min-plus or max-plus, the loop over k stops early.
+        A max-plus product is the negated min-plus product of negated matrices.
+        """
+        if isinstance(self.semiring, R_max_plus):
+            def neg(X):
+                return [[-x for x in row] for row in X]
+
+            return neg(self.mul_pruned_min_plus(neg(A), neg(B)))
+        return self.mul_pruned_min_plus(A, B)
+
+    def mul_pruned_min_plus(self, A, B):
+        """
+        Returns the min-plus product of two matrices. Elements of a row of A are taken in the increasing order,
+        the loop stops as soon as an element plus the minimum of the column of B cannot improve the current minimum.
+        """
+        columns = list(zip(*B))
+        minima = [min(column) for column in columns]
+        C = []
+        for row in A:
+            order = sorted(range(self.n), key=row.__getitem__)
+            Ci = []
+            for column, b in zip(columns, minima):
+                best = INFTY
+                for k in order:
+                    a = row[k]
+                    if a + b >= best:
+                        break
+                    c = a + column[k]
+                    if c < best:
+                        best = c
+                Ci.append(best)
+            C.append(Ci)
+        return C
+
+    def mul_dense(self, A, B):
         """Returns the product of two matrices over a semiring."""
         C = self.zero()
 
@@ -98,25 +597,110 @@ class MatrixSemiring:
 
     def mul_by_coef(self, coef, A):
         """Returns the product of an element of a semiring and a matrix over the semiring."""
+        K = self.kernels()
+        if K:
+            return K.tolist(K.mul_by_coef(coef, K.array(A)))
         return [[self.semiring.mul(A[i][j], coef) for j in range(self.n)] for i in range(self.n)]
 
-    def pwr(self, A, m):
-        """Returns a matrix raised to the power m over a semiring."""
+    def freeze(self, A):
+        """Returns A as an immutable matrix, interned if the matrix semiring interns matrices."""
+        return Matrix.intern(A) if self.intern else Matrix(A)
+
+    def normalize(self, A):
+        """Returns c and the immutable matrix A' such that A = c * A', c is the minimal non-zero element of A."""
+        return Matrix(A).normalize(self.semiring)
+
+    def find_periodicity(self, A, bound):
+        """
+        Looks for the transient and the cyclicity of A among A^0, ..., A^bound.
+        Returns the found periodicity and records it for A, returns None otherwise.
+        """
+        return self._scan_powers(A, bound)[1]
+
+    def _scan_powers(self, A, bound, backend=None):
+        """Computes A^0, ..., A^bound until they repeat up to a const. Returns computed powers and the periodicity."""
+        key = Matrix(A)
+        periodicity = self.periodicities.find(key)
+        if periodicity:
+            return periodicity.ladder, periodicity
+
+        ladder = [self.one()]
+        if type(self.semiring).div is Semiring.div:
+            for k in range(1, bound + 1):
+                ladder.append(self.mul(ladder[-1], A, backend))
+            return ladder, None
+
+        shifts = []
+        seen = dict()
+        for k in range(bound + 1):
+            if k > 0:
+                ladder.append(self.mul(ladder[-1], A, backend))
+            c, N = self.normalize(ladder[k])
+            shifts.append(c)
+            j = seen.get(N)
+            if j is not None:
+                shift = self.semiring.div(c, shifts[j])
+                if self.mul_by_coef(shift, ladder[j]) == ladder[k]:
+                    periodicity = Periodicity(j, k - j, shift, ladder[:k])
+                    self.periodicities.put(
+                        key, periodicity, public_cache.get_matrices_size(self, k))
+                    return ladder[:k], periodicity
+            seen[N] = k
+
+        return ladder, None
+
+    def get_periodicity(self, A):
+        """Returns the recorded periodicity of A or None."""
+        return self.periodicities.find(Matrix(A))
+
+    def pwr(self, A, m, backend=None):
+        """
+        Returns a matrix raised to the power m over a semiring.
+        If a backend is given, by the argument or otherwise, every product is computed by the backend.
+        """
+        P = self.get_periodicity(A)
+        if P:
+            k, q = P.reduce(m)
+            return self.mul_by_coef(self.semiring.pwr(P.shift, q), P.ladder[k])
+        K = self.kernels()
+        if K and self.get_mul_backend(A, A, backend) == "auto":
+            return K.tolist(K.pwr(K.array(A), m))
+        return self._pwr(A, m, backend)
+
+    def _pwr(self, A, m, backend=None):
         if m == 0:
             return self.one()
         if m % 2 == 0:
-            return self.pwr(self.mul(A, A), m // 2)
+            return self._pwr(self.mul(A, A, backend), m // 2, backend)
         else:
-            return self.mul(A, self.pwr(A, m - 1))
+            return self.mul(A, self._pwr(A, m - 1, backend), backend)
 
-    def calc_poly(self, p, A):
-        """Given a matrix A and a polynomial p over a semiring. Returns p(A)."""
+    def calc_poly(self, p, A, backend=None):
+        """
+        Given a matrix A and a polynomial p over a semiring. Returns p(A).
+        If powers of A repeat up to a const, then p(A) is computed by the periodicity of A without multiplications.
+        """
         d = len(p) - 1
+        ladder, P = self._scan_powers(A, d, backend)
+        if P:
+            coefs = [self.semiring.zero() for _ in P.ladder]
+            for i in range(d + 1):
+                k, q = P.reduce(i)
+                coefs[k] = self.semiring.sum(coefs[k], self.semiring.mul(
+                    p[i], self.semiring.pwr(P.shift, q)))
+            k = min(d + 1, len(P.ladder))
+            return self.poly_from_ladder(coefs[:k], P.ladder[:k])
+
+        return self.poly_from_ladder(p, ladder)
+
+    def poly_from_ladder(self, coefs, ladder):
+        """Returns the sum of coefs[k] * ladder[k]."""
+        K = self.kernels()
+        if K:
+            return K.tolist(K.poly_from_ladder(coefs, [K.array(A) for A in ladder]))
+
         C = self.zero()
-        D = self.one()
-        for i in range(d + 1):
-            C = self.sum(C, self.mul_by_coef(p[i], D))
-            if i != d:
-                D = self.mul(D, A)
+        for k in range(len(coefs)):
+            C = self.sum(C, self.mul_by_coef(coefs[k], ladder[k]))
 
         return C
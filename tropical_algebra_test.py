@@ -2,11 +2,15 @@
 (c) I. Buchinskiy, M. Kotov, A. Treier, 2023
 """
 
+import collections
 import sys
 import unittest
+import unittest.mock
 import tropical_algebra
 import matrix_tools
+import public_cache
 import random
+import test_tools
 
 
 class TestTropicalAlgebra(unittest.TestCase):
@@ -74,6 +78,130 @@ class TestTropicalAlgebra(unittest.TestCase):
 
         self.assertEqual(P, M.pwr(A, 3))
 
+    def test_matrix_min_plus_algebra_periodicity(self):
+        M = tropical_algebra.MatrixSemiring(tropical_algebra.R_min_plus(), 3)
+
+        A = [[-42, 13, -96], [-28, 16, 65], [-85, 31, -75]]
+
+        P = M.find_periodicity(A, 20)
+        self.assertEqual(3, P.transient)
+        self.assertEqual(2, P.cyclicity)
+        self.assertEqual(-181, P.shift)
+        self.assertEqual(-90.5, P.cycle_mean())
+        self.assertIs(P, M.get_periodicity(A))
+        self.assertEqual(public_cache.get_matrices_size(M, 5), M.periodicities.bytes)
+        self.assertEqual(M._pwr(A, 1001), M.pwr(A, 1001))
+        self.assertEqual(
+            [[-90575, -90487, -90596], [-90528, -90412, -90518], [-90585, -90469, -90575]], M.pwr(A, 1001))
+
+        # Ladders are kept up to max_periodicity_bytes, the ladder of 5 matrices does not fit into 4 ones.
+        M = tropical_algebra.MatrixSemiring(tropical_algebra.R_min_plus(), 3)
+        M.periodicities.max_bytes = public_cache.get_matrices_size(M, 4)
+        self.assertEqual(3, M.find_periodicity(A, 20).transient)
+        self.assertIsNone(M.get_periodicity(A))
+
+    def test_matrix_max_plus_algebra_poly_periodicity(self):
+        M = tropical_algebra.MatrixSemiring(tropical_algebra.R_max_plus(), 4)
+
+        for i in range(10):
+            A = matrix_tools.generate_random_matrix(M, -100, 100)
+            A[random.randint(0, 3)][random.randint(0, 3)
+                                    ] = tropical_algebra.MINFTY
+            p = matrix_tools.generate_random_polynomial(
+                random.randint(1, 100), -1000, 1000)
+            P = M.zero()
+            for k in range(len(p)):
+                P = M.sum(P, M.mul_by_coef(p[k], M._pwr(A, k)))
+            self.assertEqual(P, M.calc_poly(p, A))
+
+    def test_get_first_repeated(self):
+        M = tropical_algebra.MatrixSemiring(tropical_algebra.R_min_plus(), 3)
+
+        A = [[-42, 13, -96], [-28, 16, 65], [-85, 31, -75]]
+
+        self.assertEqual(5, matrix_tools.get_first_repeated(M, A, 20))
+        self.assertEqual(None, matrix_tools.get_first_repeated(M, A, 5))
+
+    def test_immutable_matrix(self):
+        R = tropical_algebra.MatrixSemiring(
+            tropical_algebra.R_min_plus(), 2, intern=True)
+
+        A = [[1, 2], [5, tropical_algebra.INFTY]]
+        B = [[4, 5], [8, tropical_algebra.INFTY]]
+        M = tropical_algebra.Matrix(A)
+
+        self.assertEqual(A, M)
+        self.assertEqual(M, A)
+        self.assertNotEqual(M, B)
+        self.assertNotEqual(B, M)
+        self.assertEqual(A, M.tolist())
+        self.assertEqual(5, M[1][0])
+        self.assertEqual(hash(M), hash(tropical_algebra.Matrix(A)))
+        self.assertIs(R.freeze(A), R.freeze(M))
+        self.assertEqual({M: 1}[tropical_algebra.Matrix(A)], 1)
+
+        self.assertEqual(M.normalized_hash(R.semiring),
+                         R.freeze(B).normalized_hash(R.semiring))
+        self.assertEqual(
+            (1, [[0, 1], [4, tropical_algebra.INFTY]]), R.normalize(A))
+        self.assertEqual(3, matrix_tools.is_matrix_minus_matrix_const(
+            R, R.freeze(B), M))
+        self.assertTrue(matrix_tools.is_matrix_repeated(R, [A, M, B]))
+        self.assertFalse(matrix_tools.is_matrix_repeated(R, [A, M, R.one()]))
+
+        # Semirings without division compare matrices elementwise.
+        for S in [tropical_algebra.R_max_min(), tropical_algebra.R_min_max()]:
+            R = tropical_algebra.MatrixSemiring(S, 2, intern=True)
+            A = [[1, 2], [3, 4]]
+            B = [[3, 4], [5, 6]]
+            for X, Y in [(A, B), (R.freeze(A), R.freeze(B))]:
+                self.assertTrue(matrix_tools.is_matrix_repeated(R, [X, X]))
+                self.assertTrue(matrix_tools.is_matrix_repeated(R, [X, Y]))
+                self.assertFalse(matrix_tools.is_matrix_repeated(R, [X, [[1, 2], [3, 5]]]))
+
+    def test_interned_matrices(self):
+        with unittest.mock.patch.object(tropical_algebra.Matrix, "max_interned", 2), \
+                unittest.mock.patch.object(tropical_algebra.Matrix, "interned", collections.OrderedDict()):
+            A = tropical_algebra.Matrix.intern([[1]])
+            B = tropical_algebra.Matrix.intern([[2]])
+            # A is used again, so B is the least recently used matrix and it is evicted.
+            self.assertIs(A, tropical_algebra.Matrix.intern([[1]]))
+            tropical_algebra.Matrix.intern([[3]])
+            self.assertIs(A, tropical_algebra.Matrix.intern([[1]]))
+            self.assertIsNot(B, tropical_algebra.Matrix.intern([[2]]))
+
+    def test_sparse_matrix(self):
+        for S in [tropical_algebra.R_min_plus(), tropical_algebra.R_max_plus()]:
+            R = tropical_algebra.MatrixSemiring(S, 10)
+            for i in range(10):
+                Y = matrix_tools.generate_random_matrix(R, -100, 100)
+                B = matrix_tools.generate_basis_lower_t_circulant_matrix(
+                    R, random.randint(-100, 100), i)
+                SB = R.sparse(B)
+                SU = R.sparse(R.one())
+
+                self.assertEqual(10, SB.nnz())
+                self.assertEqual(B, SB.todense(S.zero()))
+                self.assertIsNone(R.sparse(Y))
+                self.assertEqual(R.mul_dense(B, Y), R.mul(B, Y))
+                self.assertEqual(R.mul_dense(Y, B), R.mul(Y, B))
+                self.assertEqual(R.mul_dense(B, R.one()),
+                                 R.mul_sparse_sparse(SB, SU))
+                self.assertEqual(Y, R.mul_sparse_dense(SU, Y))
+                self.assertEqual(Y, R.mul_dense_sparse(Y, SU))
+
+    def test_mul_pruned(self):
+        for S in [tropical_algebra.R_min_plus(), tropical_algebra.R_max_plus()]:
+            R = tropical_algebra.MatrixSemiring(S, 10)
+            for i in range(10):
+                A = matrix_tools.generate_random_matrix(R, -100, 100)
+                B = matrix_tools.generate_random_matrix(R, -100, 100)
+                A[i][i] = S.zero()
+                B[i] = [S.zero()] * 10
+                self.assertEqual(R.mul_dense(A, B), R.mul_pruned(A, B))
+                self.assertEqual(R.mul_dense(B, A), R.mul_pruned(B, A))
+                self.assertEqual(R.one(), R.mul_pruned(R.one(), R.one()))
+
     def test_mul_basis_upper_t_circulant_matrix_and_matrix(self):
         R = tropical_algebra.MatrixSemiring(
             tropical_algebra.R_min_plus(), 10)
@@ -133,6 +261,55 @@ class TestTropicalAlgebra(unittest.TestCase):
         self.assertEqual(
             Q1, matrix_tools.generate_anti_t_p_circulant_matrix(R, -2082, t, p))
 
+    def test_basis_products(self):
+        R = tropical_algebra.MatrixSemiring(
+            tropical_algebra.R_min_plus(), 5)
+        Y = matrix_tools.generate_random_matrix(R, -100, 100)
+        s = -7
+        t = 11
+        p = 3
+        for kind, generate in [("upper", matrix_tools.generate_basis_upper_t_circulant_matrix),
+                               ("lower", matrix_tools.generate_basis_lower_t_circulant_matrix)]:
+            products = matrix_tools.BasisProducts(R, kind, s, t, Y)
+            for i in range(5):
+                for j in range(5):
+                    self.assertEqual(R.mul(R.mul(generate(R, s, i), Y), generate(R, t, j)),
+                                     products(i, j))
+            self.assertEqual(generate(R, t, 2),
+                             matrix_tools.get_basis_matrix(R, kind, t, k=2))
+
+        products = matrix_tools.BasisProducts(R, "anti", s, t, Y, p)
+        self.assertEqual(R.mul(R.mul(matrix_tools.generate_basis_anti_t_p_circulant_matrix(R, s, p), Y),
+                               matrix_tools.generate_basis_anti_t_p_circulant_matrix(R, t, p)), products(0, 0))
+        self.assertIs(matrix_tools.get_basis_matrix(R, "anti", s, p),
+                      matrix_tools.get_basis_matrix(R, "anti", s, p))
+
+    def test_random_generator(self):
+        R = tropical_algebra.MatrixSemiring(
+            tropical_algebra.R_min_plus(), 5)
+
+        def generate(rng):
+            return (matrix_tools.generate_random_matrix(R, -10, 10, rng),
+                    matrix_tools.generate_random_polynomial(
+                        matrix_tools.randint(1, 5, rng), -10, 10, rng),
+                    matrix_tools.generate_random_upper_t_circulant_matrix(
+                        R, 3, -10, 10, rng),
+                    matrix_tools.generate_random_anti_t_p_circulant_matrix(R, 3, 2, -10, 10, rng))
+
+        A, p, U, C = generate(test_tools.get_random_generator(7))
+        self.assertEqual((A, p, U, C), generate(
+            test_tools.get_random_generator(7)))
+        self.assertNotEqual(A, generate(test_tools.get_random_generator(8))[0])
+        self.assertTrue(all(-10 <= x <= 10 and type(x) is int
+                        for row in A for x in row))
+        self.assertTrue(2 <= len(p) <= 6)
+
+        As = matrix_tools.generate_random_matrices(
+            R, -10, 10, 100, test_tools.get_random_generator(7))
+        self.assertEqual((100, 5, 5), As.shape)
+        self.assertEqual(-10, As.min())
+        self.assertEqual(10, As.max())
+
 
 if __name__ == "__main__":
     unittest.main()